@@ -5,18 +5,26 @@ import uvicorn
 from src.core.config import settings
 from src.api.server import app
 
+try:
+    import uvloop  # noqa: F401  (shipped with uvicorn[standard]; absent on Windows)
+    EVENT_LOOP = "uvloop"
+except ImportError:
+    EVENT_LOOP = "asyncio"
+
 
 def main():
     """Main function to start the server"""
     print("🚀 Starting Financial Expert Python Backend...")
     print(f"📍 Server will run on {settings.host}:{settings.port}")
     print(f"🔧 Debug mode: {settings.debug}")
+    print(f"🔁 Event loop: {EVENT_LOOP}")
     
     uvicorn.run(
         "src.api.server:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
+        loop=EVENT_LOOP,
         log_level="info"
     )
 
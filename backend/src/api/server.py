@@ -5,17 +5,19 @@ import os
 from typing import Dict, Any, List
 from datetime import datetime
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from ..core.config import settings
 from ..core.graph import graph, GraphState, create_graph, register_stream_callback
-from ..models.types import ThreadCreateResponse, StreamRequest
+from ..models.types import ThreadCreateResponse, StreamRequest, ThreadMessage
 from ..tools.registry import TOOL_BY_NAME
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from ..store.threads_pg import (
     ensure_thread,
     insert_message as pg_insert_message,
-    load_messages as pg_load_messages,
+    load_thread_bundle as pg_load_thread_bundle,
     delete_thread as pg_delete_thread,
     touch_thread as pg_touch_thread,
     get_thread_owner,
@@ -150,6 +152,37 @@ async def init_async_checkpointer():
     except Exception as e:
         print(f"[startup] init_async_checkpointer failed: {e}")
 
+# Open the shared MySQL pool at startup and close it on shutdown (optional)
+@app.on_event("startup")
+async def init_mysql_pool():
+    if not getattr(settings, "mysql_host", None):
+        return
+    try:
+        from ..tools.sql.mysql_base import db_manager
+        await db_manager.startup()
+        app.add_event_handler("shutdown", db_manager.shutdown)
+        print("[startup] MySQL pool ready")
+    except Exception as e:
+        # Queries will retry the connection lazily
+        print(f"[startup] MySQL pool init failed: {e}")
+
+# Rebuild the document vector index before serving when asked to (optional)
+@app.on_event("startup")
+async def migrate_document_index():
+    address = getattr(settings, "milvus_address", None)
+    if not address or not getattr(settings, "milvus_migrate_index_on_startup", False):
+        return
+    try:
+        from ..tools.document.partition_manager import get_partition_manager
+        pm = get_partition_manager(f"http://{address}")
+        if not await pm.ensure_collection_and_partitions():
+            print("[startup] document index migration skipped: collection unavailable")
+            return
+        result = await pm.migrate_vector_index()
+        print(f"[startup] document index migration: {result}")
+    except Exception as e:
+        print(f"[startup] document index migration failed: {e}")
+
 # Thread history storage removed; persisted store is the source of truth
 
 
@@ -194,9 +227,25 @@ async def create_thread(request: Request):
     return ThreadCreateResponse(thread_id=thread_id)
 
 
-@app.post("/api/threads/{thread_id}/runs/stream")
-async def stream_response(thread_id: str, request: StreamRequest, http_request: Request):
+@app.post(
+    "/api/threads/{thread_id}/runs/stream",
+    # The body is read by hand below, so declare its schema for OpenAPI explicitly
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": StreamRequest.model_json_schema()}},
+    }},
+)
+async def stream_response(thread_id: str, http_request: Request):
     """Stream response endpoint"""
+    # Parse + validate the raw body in one pass (no intermediate dict from FastAPI)
+    try:
+        request = StreamRequest.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        # FastAPI's handler renders the usual 422 body (jsonable_encoder on the errors);
+        # locations get the "body" prefix FastAPI adds for a typed body parameter
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
     print(f"[Stream] 收到流式请求，线程ID: {thread_id}")
     print(f"[Stream] 输入: {request.input}")
     # 早返回：将线程校验与归属检查移入生成器内部，先发 ACK 减少首字延迟
@@ -233,12 +282,15 @@ async def stream_response(thread_id: str, request: StreamRequest, http_request:
         
         # ACK 后再进行线程存在性与归属检查，失败则发送错误并结束
         try:
+            # The upsert reports the thread's owner, so no separate owner lookup
+            owner = None
             try:
-                await ensure_thread(thread_id, getattr(http_request.state, "user_id", None))
+                owner = await ensure_thread(thread_id, getattr(http_request.state, "user_id", None))
             except Exception as e:
                 print(f"[Stream] ensure_thread failed (post-ack): {e}")
             try:
-                owner = await get_thread_owner(thread_id)
+                if owner is None:
+                    owner = await get_thread_owner(thread_id)
                 req_uid = getattr(http_request.state, "user_id", None)
                 if owner is None or owner != req_uid:
                     raise HTTPException(status_code=404, detail="Thread not found")
@@ -660,12 +712,15 @@ async def stream_response(thread_id: str, request: StreamRequest, http_request:
                         pass
                     
                     # In-memory history update removed
-                    # Persist assistant final message and touch thread
+                    # Persist assistant final message; inserting it also bumps the
+                    # thread's updated_at, so the thread is only touched when nothing is stored
                     try:
+                        persisted = False
                         if has_streamed_content:
                             # Use accumulated content if available
                             payload = {"type": "text", "text": current_content}
                             await pg_insert_message(thread_id, "assistant", payload, getattr(http_request.state, "user_id", None))
+                            persisted = True
                             # Optional verbose logging of final content for cross-checking with frontend
                             try:
                                 if os.getenv("LOG_FULL_ASSISTANT_REPLY", "1") == "1":
@@ -693,11 +748,13 @@ async def stream_response(thread_id: str, request: StreamRequest, http_request:
                                         print(f"[Stream] Fallback content length: {len(text_out)}")
                                         print(f"[Stream] Fallback content preview: {preview}")
                                     await pg_insert_message(thread_id, "assistant", {"type": "text", "text": text_out}, getattr(http_request.state, "user_id", None))
+                                    persisted = True
                                 else:
                                     print("[Stream] No streamed content and no text found in result; skip persist")
                             except Exception as _e_fb:
                                 print(f"[Stream] fallback persist failed: {_e_fb}")
-                        await pg_touch_thread(thread_id, getattr(http_request.state, "user_id", None))
+                        if not persisted:
+                            await pg_touch_thread(thread_id, getattr(http_request.state, "user_id", None))
                     except Exception as e:
                         print(f"[Stream] 持久化助手消息/更新线程失败: {e}")
 
@@ -767,13 +824,17 @@ async def stream_response(thread_id: str, request: StreamRequest, http_request:
 async def get_thread_messages(thread_id: str, request: Request):
     """Get thread messages"""
     try:
-        # Prefer persisted store for auth; in-memory is best-effort and not per-user
-        rows = await pg_load_messages(thread_id, getattr(request.state, "user_id", None))
-        if rows is None:
+        # Prefer persisted store for auth; in-memory is best-effort and not per-user.
+        # Owner and messages come from one query; unknown and foreign threads are
+        # 404, as in the stream and approval handlers
+        req_uid = getattr(request.state, "user_id", None)
+        owner, rows = await pg_load_thread_bundle(thread_id, req_uid)
+        if owner is None or owner != req_uid:
             raise HTTPException(status_code=404, detail="Thread not found")
         return {
             "thread_id": thread_id,
-            "messages": rows,
+            # Rows come from our own table: build the models without re-validating
+            "messages": [ThreadMessage.from_row(r) for r in rows],
         }
     except HTTPException:
         raise
@@ -870,7 +931,6 @@ async def approve_tool(thread_id: str, request: Request):
                 "args": args,
                 "result": result,
             }, getattr(request.state, "user_id", None))
-            await pg_touch_thread(thread_id, getattr(request.state, "user_id", None))
         except Exception as e:
             print(f"[approval] persist result failed: {e}")
         return {"ok": True, "result": result}
@@ -30,9 +30,25 @@ class Settings(BaseSettings):
     openai_embed_base_url: Optional[str] = Field(None, env="OPENAI_EMBED_BASE_URL")
     openai_embed_model: Optional[str] = Field(None, env="OPENAI_EMBED_MODEL")
     openai_embed_dim: Optional[int] = Field(None, env="OPENAI_EMBED_DIM")
+    # Texts per embeddings request, and how many such requests may be in flight at once
+    openai_embed_batch_size: int = Field(256, env="OPENAI_EMBED_BATCH_SIZE")
+    openai_embed_max_in_flight: int = Field(8, env="OPENAI_EMBED_MAX_IN_FLIGHT")
+    # SQLite file for the persistent chunk-embedding cache (unset = disabled)
+    embedding_cache_path: Optional[str] = Field(None, env="EMBEDDING_CACHE_PATH")
+    # Stored vector precision: "float32" or "float16" (Milvus 2.4+; halves vector bytes).
+    # Changing it requires recreating the documents collection.
+    embedding_storage_dtype: str = Field("float32", env="EMBEDDING_STORAGE_DTYPE")
+    # PDF chunk size/overlap in cl100k_base tokens (0 = 1000/200 characters instead)
+    chunk_tokens: int = Field(512, env="CHUNK_TOKENS")
+    chunk_overlap_tokens: int = Field(64, env="CHUNK_OVERLAP_TOKENS")
+    # Spawned processes for PDF parsing/chunking (each is a separate interpreter)
+    pdf_workers: int = Field(2, env="PDF_WORKERS")
     # Vector storage configuration
     documents_collection_name: Optional[str] = Field("documents", env="DOCUMENTS_COLLECTION_NAME")
     reset_documents_collection_on_startup: bool = Field(False, env="RESET_DOCUMENTS_COLLECTION_ON_STARTUP")
+    # Document classifier: directory of an int8-quantized ONNX export of bart-large-mnli
+    # (e.g. produced offline with `optimum-cli onnxruntime quantize`); unset -> PyTorch model
+    classifier_onnx_path: Optional[str] = Field(None, env="CLASSIFIER_ONNX_PATH")
 
     # Web search providers
     tavily_api_key: Optional[str] = Field(None, env="TAVILY_API_KEY")
@@ -49,6 +65,13 @@ class Settings(BaseSettings):
     # Milvus Configuration
     milvus_address: Optional[str] = Field(None, env="MILVUS_ADDRESS")
     milvus_ssl: bool = Field(False, env="MILVUS_SSL")
+    # IVF search breadth: clusters probed per query (recall vs latency)
+    milvus_nprobe: int = Field(16, env="MILVUS_NPROBE")
+    # gRPC channels per document PartitionManager (requests round-robin over them)
+    milvus_pool_size: int = Field(4, env="MILVUS_POOL_SIZE")
+    # Resize/switch the vector index (SQ8 -> PQ, nlist by row count) before serving;
+    # collections are unsearchable while it rebuilds
+    milvus_migrate_index_on_startup: bool = Field(False, env="MILVUS_MIGRATE_INDEX_ON_STARTUP")
 
     # Neo4j / Graphiti configuration
     neo4j_uri: Optional[str] = Field(None, env="NEO4J_URI")
@@ -77,6 +100,9 @@ class Settings(BaseSettings):
     enable_vision: bool = Field(True, env="ENABLE_VISION")
     vision_max_image_size: int = Field(20, env="VISION_MAX_IMAGE_SIZE")  # MB
 
+    # Document upload configuration
+    max_upload_size: int = Field(50, env="MAX_UPLOAD_SIZE")  # MB
+
     # RAG Configuration
     rag_attempts_max: int = Field(1, env="RAG_ATTEMPTS_MAX")
     rag_top_k_fast: int = Field(6, env="RAG_TOP_K_FAST")
@@ -0,0 +1,47 @@
+"""
+Columnar batches over the financial row types in ``types``.
+
+Kept apart from ``types`` so that importing the API models does not load numpy.
+"""
+from dataclasses import dataclass, fields
+from typing import Dict, List, Sequence
+import numpy as np
+
+from .types import IncomeStatement, Period
+
+
+_INCOME_NUMERIC_FIELDS = tuple(f.name for f in fields(IncomeStatement) if f.type is float)
+
+
+@dataclass(slots=True)
+class IncomeStatementBatch:
+    """Columnar (structure-of-arrays) view over many IncomeStatement rows.
+
+    Analytics over a time series (ratios, growth, aggregates) should operate on
+    ``columns[name]`` as whole float64 arrays instead of iterating row objects.
+    """
+    ticker: List[str]
+    calendar_date: List[str]
+    report_period: List[str]
+    period: List[Period]
+    columns: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[IncomeStatement]) -> "IncomeStatementBatch":
+        n = len(rows)
+        return cls(
+            ticker=[r.ticker for r in rows],
+            calendar_date=[r.calendar_date for r in rows],
+            report_period=[r.report_period for r in rows],
+            period=[r.period for r in rows],
+            columns={
+                name: np.fromiter((getattr(r, name) for r in rows), dtype=np.float64, count=n)
+                for name in _INCOME_NUMERIC_FIELDS
+            },
+        )
+
+    def __len__(self) -> int:
+        return len(self.ticker)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
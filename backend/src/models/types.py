@@ -1,8 +1,10 @@
 """
 Type definitions for the  backend
 """
+import json
+from dataclasses import dataclass
 from typing import List, Optional, Union, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
 from enum import Enum
 
@@ -13,7 +15,8 @@ class Period(str, Enum):
     ANNUAL = "annual"
 
 
-class CompanyFacts(BaseModel):
+@dataclass(slots=True, frozen=True)
+class CompanyFacts:
     ticker: str
     name: str
     cik: str
@@ -30,7 +33,8 @@ class CompanyFactsResponse(BaseModel):
     company_facts: CompanyFacts
 
 
-class IncomeStatement(BaseModel):
+@dataclass(slots=True, frozen=True)
+class IncomeStatement:
     ticker: str
     calendar_date: str
     report_period: str
@@ -61,7 +65,9 @@ class IncomeStatement(BaseModel):
 class IncomeStatementsResponse(BaseModel):
     income_statements: List[IncomeStatement]
 
-class CashFlowStatement(BaseModel):
+
+@dataclass(slots=True, frozen=True)
+class CashFlowStatement:
     ticker: str
     calendar_date: str
     report_period: str
@@ -85,6 +91,14 @@ class CashFlowStatementsResponse(BaseModel):
     cash_flow_statements: List[CashFlowStatement]
 
 
+# Financial rows are plain value objects. Rows from trusted internal sources are
+# built directly (e.g. ``IncomeStatement(**row)``); external JSON ingress goes
+# through these adapters, built once at import and reused.
+CompanyFactsAdapter = TypeAdapter(CompanyFacts)
+IncomeStatementListAdapter = TypeAdapter(List[IncomeStatement])
+CashFlowStatementListAdapter = TypeAdapter(List[CashFlowStatement])
+
+
 # API Request/Response Models
 class ThreadCreateRequest(BaseModel):
     pass
@@ -99,6 +113,24 @@ class Message(BaseModel):
     content: str
 
 
+class ThreadMessage(Message):
+    id: int
+    created_at: datetime
+
+    @classmethod
+    def from_row(cls, row: Any) -> "ThreadMessage":
+        """Build from a trusted ``thread_messages`` row without validation.
+
+        The jsonb codec decodes ``content``; the API returns it as a JSON string.
+        """
+        return cls.model_construct(
+            id=row.id,
+            role=row.role,
+            content=json.dumps(row.content, ensure_ascii=False),
+            created_at=row.created_at,
+        )
+
+
 class StreamRequest(BaseModel):
     input: Dict[str, Any] = Field(..., description="Input data for the stream")
 
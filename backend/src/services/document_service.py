@@ -9,7 +9,14 @@ import os
 
 from ..tools.document.processor import PDFProcessor
 from ..tools.document.search_engine import DocumentSearchEngine
-from ..tools.document.classifier import DOCUMENT_CATEGORIES
+from ..tools.document.classifier import CATEGORIES_INFO, DOCUMENT_CATEGORIES
+from ..tools.document.document_tools import invalidate_search_cache
+
+# Category validation data never changes at runtime; build it once at import
+_CATEGORY_KEYS = frozenset(DOCUMENT_CATEGORIES)
+_CATEGORY_LIST_STR = ", ".join(DOCUMENT_CATEGORIES)
+
+_UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
 
 
 class DocumentService:
@@ -43,25 +50,39 @@ class DocumentService:
                 }
             
             # Validate category if provided
-            if user_category and user_category.lower() not in DOCUMENT_CATEGORIES:
+            if user_category and user_category.lower() not in _CATEGORY_KEYS:
                 return {
                     "success": False,
-                    "error": f"Invalid category: {user_category}. Valid categories: {', '.join(DOCUMENT_CATEGORIES.keys())}",
+                    "error": f"Invalid category: {user_category}. Valid categories: {_CATEGORY_LIST_STR}",
                     "filename": file.filename
                 }
             
-            # Read file content
-            file_content = await file.read()
-            
-            # Process PDF
-            result = await self.pdf_processor.process_pdf_content(
-                file_content=file_content,
-                filename=file.filename,
-                user_category=user_category.lower() if user_category else None,
-                user_id=user_id,
-            )
+            # Stream upload to a temp file in fixed-size chunks (bounded memory per upload)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                tmp_file_path = tmp_file.name
+                while True:
+                    chunk = await file.read(_UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    tmp_file.write(chunk)
             
-            return result
+            try:
+                # Process PDF from disk
+                result = await self.pdf_processor.process_pdf_file(
+                    file_path=tmp_file_path,
+                    filename=file.filename,
+                    user_category=user_category.lower() if user_category else None,
+                    user_id=user_id,
+                )
+                # Partial uploads stored rows too: cached searches must see them
+                if result.get("success") or result.get("partial"):
+                    invalidate_search_cache()
+                return result
+            finally:
+                try:
+                    os.unlink(tmp_file_path)
+                except OSError:
+                    pass
             
         except Exception as e:
             return {
@@ -104,13 +125,8 @@ class DocumentService:
     async def get_categories_info(self) -> Dict[str, Any]:
         """Get information about available document categories."""
         try:
-            categories_info = {}
-            for category, info in DOCUMENT_CATEGORIES.items():
-                categories_info[category] = {
-                    "name": info["name"],
-                    "description": info["description"],
-                    "partition": info["partition"]
-                }
+            # Copies of the classifier's read-only metadata; only document_count is per request
+            categories_info = {k: dict(v) for k, v in CATEGORIES_INFO.items()}
             
             # Try to get partition statistics
             try:
@@ -141,7 +157,10 @@ class DocumentService:
     async def delete_document(self, filename: str) -> Dict[str, Any]:
         """Delete a document by filename."""
         try:
-            return await self.pdf_processor.delete_document_by_filename(filename)
+            result = await self.pdf_processor.delete_document_by_filename(filename)
+            if result.get("success"):
+                invalidate_search_cache()
+            return result
         except Exception as e:
             return {
                 "success": False,
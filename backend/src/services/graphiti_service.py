@@ -32,9 +32,11 @@ async def get_graphiti_client() -> "Graphiti":
         if not uri or not user or not password:
             raise RuntimeError("Missing NEO4J_* environment variables for Graphiti initialization")
         client = Graphiti(uri, user, password, database=database)  # type: ignore
-        # Install tracing proxies on the underlying neo4j driver when TRACE is enabled
+        # Install tracing proxies on the underlying neo4j driver when TRACE is enabled;
+        # otherwise the raw driver is used directly (no proxy object at all)
+        trace_enabled = bool(getattr(settings, "trace_events", False))
         try:
-            if getattr(settings, "trace_events", False):
+            if trace_enabled:
                 drv = getattr(client, "driver", None)
                 if drv is not None:
                     client.driver = _TracingDriverProxy(drv)  # type: ignore
@@ -46,40 +48,80 @@ async def get_graphiti_client() -> "Graphiti":
         return _graphiti_client
 
 # ===== Tracing proxies for Neo4j driver (debug-only; no behavior change) =====
+# Only constructed when settings.trace_events is set, so they log without re-checking it.
+
+def _clip(value, limit: int) -> str:
+    text = str(value)  # materialize once; callers used to str() the query twice
+    return (text[:limit] + "...") if len(text) > limit else text
+
+
+def _params_preview(parameters) -> dict:
+    return {k: _clip(v, 120) if isinstance(v, str) else v for k, v in (parameters or {}).items()}
+
+
+def _elapsed_ms(t0: float) -> int:
+    return int((time.perf_counter() - t0) * 1000)
+
 
 class _TracingAsyncResultProxy:
+    __slots__ = ("_result",)
+
     def __init__(self, result):
         self._result = result
 
+    # Hot methods forwarded explicitly; __getattr__ stays as the cold fallback.
+    # (__aiter__ must live on the class: dunder lookups bypass __getattr__.)
+    def __aiter__(self):
+        return self._result.__aiter__()
+
+    def data(self, *args, **kwargs):
+        return self._result.data(*args, **kwargs)
+
+    def single(self, *args, **kwargs):
+        return self._result.single(*args, **kwargs)
+
+    def consume(self):
+        return self._result.consume()
+
+    def keys(self):
+        return self._result.keys()
+
     def __getattr__(self, item):
         return getattr(self._result, item)
 
 
 class _TracingAsyncSessionProxy:
+    __slots__ = ("_session",)
+
     def __init__(self, session):
         self._session = session
 
+    def close(self):
+        return self._session.close()
+
+    def cancel(self):
+        return self._session.cancel()
+
+    def closed(self):
+        return self._session.closed()
+
     # ---- core query API ----
     async def run(self, query, **parameters):  # type: ignore
         t0 = time.perf_counter()
         try:
-            q_preview = (str(query)[:300] + "...") if len(str(query)) > 300 else str(query)
             try:
-                if getattr(settings, "trace_events", False):
-                    p_preview = {k: (str(v)[:120] + "...") if isinstance(v, str) and len(v) > 120 else v for k, v in (parameters or {}).items()}
-                    print(f"[KG][driver.run] q='{q_preview}' params={p_preview}")
+                print(f"[KG][driver.run] q='{_clip(query, 300)}' params={_params_preview(parameters)}")
             except Exception:
                 pass
             res = await self._session.run(query, **parameters)
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
-                if getattr(settings, "trace_events", False):
-                    print(f"[KG][driver.run] done elapsed_ms={elapsed}")
+                print(f"[KG][driver.run] done elapsed_ms={elapsed}")
             except Exception:
                 pass
             return _TracingAsyncResultProxy(res)
         except Exception as e:
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
                 print(f"[KG][driver.run] error elapsed_ms={elapsed} err={e}")
             except Exception:
@@ -97,15 +139,14 @@ class _TracingAsyncSessionProxy:
         t0 = time.perf_counter()
         try:
             res = await self._session.execute_read(wrapped, *args, **kwargs)
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
-                if getattr(settings, "trace_events", False):
-                    print(f"[KG][execute_read] done elapsed_ms={elapsed}")
+                print(f"[KG][execute_read] done elapsed_ms={elapsed}")
             except Exception:
                 pass
             return res
         except Exception as e:
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
                 print(f"[KG][execute_read] error elapsed_ms={elapsed} err={e}")
             except Exception:
@@ -118,15 +159,14 @@ class _TracingAsyncSessionProxy:
         t0 = time.perf_counter()
         try:
             res = await self._session.execute_write(wrapped, *args, **kwargs)
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
-                if getattr(settings, "trace_events", False):
-                    print(f"[KG][execute_write] done elapsed_ms={elapsed}")
+                print(f"[KG][execute_write] done elapsed_ms={elapsed}")
             except Exception:
                 pass
             return res
         except Exception as e:
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
                 print(f"[KG][execute_write] error elapsed_ms={elapsed} err={e}")
             except Exception:
@@ -151,13 +191,17 @@ class _TracingAsyncSessionProxy:
 
 
 class _TracingDriverProxy:
+    __slots__ = ("_driver",)
+
     def __init__(self, driver):
         self._driver = driver
 
+    def close(self):
+        return self._driver.close()
+
     def session(self, *args, **kwargs):  # type: ignore
         try:
-            if getattr(settings, "trace_events", False):
-                print("[KG][driver] open session")
+            print("[KG][driver] open session")
         except Exception:
             pass
         ses = self._driver.session(*args, **kwargs)
@@ -166,30 +210,27 @@ class _TracingDriverProxy:
     async def execute_query(self, *args, **kwargs):  # type: ignore
         t0 = time.perf_counter()
         try:
-            q = args[0] if args else kwargs.get("query")
-            q_preview = (str(q)[:300] + "...") if q else None
             try:
-                if getattr(settings, "trace_events", False):
-                    print(f"[KG][execute_query] q='{q_preview}'")
+                q = args[0] if args else kwargs.get("query")
+                print(f"[KG][execute_query] q='{_clip(q, 300) if q else None}'")
             except Exception:
                 pass
             res = await self._driver.execute_query(*args, **kwargs)
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
-                if getattr(settings, "trace_events", False):
-                    # res can be (records, summary, keys) tuple in v5
-                    rows = 0
-                    try:
-                        if isinstance(res, tuple) and len(res) > 0 and hasattr(res[0], "__len__"):
-                            rows = len(res[0])
-                    except Exception:
-                        pass
-                    print(f"[KG][execute_query] done elapsed_ms={elapsed} rows={rows}")
+                # res can be (records, summary, keys) tuple in v5
+                rows = 0
+                try:
+                    if isinstance(res, tuple) and len(res) > 0 and hasattr(res[0], "__len__"):
+                        rows = len(res[0])
+                except Exception:
+                    pass
+                print(f"[KG][execute_query] done elapsed_ms={elapsed} rows={rows}")
             except Exception:
                 pass
             return res
         except Exception as e:
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
                 print(f"[KG][execute_query] error elapsed_ms={elapsed} err={e}")
             except Exception:
@@ -201,29 +242,39 @@ class _TracingDriverProxy:
 
 
 class _TracingTxProxy:
+    __slots__ = ("_tx",)
+
     def __init__(self, tx):
         self._tx = tx
 
+    def commit(self):
+        return self._tx.commit()
+
+    def rollback(self):
+        return self._tx.rollback()
+
+    def close(self):
+        return self._tx.close()
+
+    def closed(self):
+        return self._tx.closed()
+
     async def run(self, query, **parameters):  # type: ignore
         t0 = time.perf_counter()
         try:
-            q_preview = (str(query)[:300] + "...") if len(str(query)) > 300 else str(query)
             try:
-                if getattr(settings, "trace_events", False):
-                    p_preview = {k: (str(v)[:120] + "...") if isinstance(v, str) and len(v) > 120 else v for k, v in (parameters or {}).items()}
-                    print(f"[KG][tx.run] q='{q_preview}' params={p_preview}")
+                print(f"[KG][tx.run] q='{_clip(query, 300)}' params={_params_preview(parameters)}")
             except Exception:
                 pass
             res = await self._tx.run(query, **parameters)
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
-                if getattr(settings, "trace_events", False):
-                    print(f"[KG][tx.run] done elapsed_ms={elapsed}")
+                print(f"[KG][tx.run] done elapsed_ms={elapsed}")
             except Exception:
                 pass
             return res
         except Exception as e:
-            elapsed = int((time.perf_counter() - t0) * 1000)
+            elapsed = _elapsed_ms(t0)
             try:
                 print(f"[KG][tx.run] error elapsed_ms={elapsed} err={e}")
             except Exception:
@@ -7,13 +7,61 @@ route contracts.
 """
 import asyncio
 import json
-from typing import Any, Dict, List, Optional
+import re
+from functools import lru_cache
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 import asyncpg
 from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 from ..core.config import settings
 
+try:
+    import orjson
+
+    # Binary jsonb wire format is a version byte (1) followed by the JSON text
+    def _encode_jsonb(obj: Any) -> bytes:
+        return b"\x01" + orjson.dumps(obj)
+
+    def _decode_jsonb(data: bytes) -> Any:
+        return orjson.loads(data[1:])
+
+    _JSONB_FORMAT = "binary"
+except ImportError:  # pragma: no cover - optional fast path
+    try:
+        import ujson as _json_impl
+    except ImportError:
+        _json_impl = json
+
+    def _encode_jsonb(obj: Any) -> str:
+        return _json_impl.dumps(obj, ensure_ascii=False)
+
+    def _decode_jsonb(data: str) -> Any:
+        return _json_impl.loads(data)
+
+    _JSONB_FORMAT = "text"
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Per-connection setup: let asyncpg encode/decode jsonb natively (dict in, dict out)."""
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format=_JSONB_FORMAT,
+    )
+
+
+class MsgRow(NamedTuple):
+    """One persisted message, in the column order of the load query."""
+
+    id: Any
+    role: str
+    content: Any
+    created_at: datetime
+
 
 _pool: Optional[asyncpg.Pool] = None
 _init_lock = asyncio.Lock()
@@ -28,11 +76,17 @@ async def _ensure_pool() -> asyncpg.Pool:
     async with _init_lock:
         if _pool is None:
             dsn = _normalize_dsn_for_asyncpg(settings.pg_dsn)
-            _pool = await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=5)
+            _pool = await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=5, init=_init_connection)
             await _verify_schema(_pool)
     return _pool
 
 
+_PSYCOPG_SCHEME = re.compile(r"^postgresql\+psycopg://")
+# libpq-only keepalive params not understood by asyncpg/server
+_DSN_SKIP_PARAMS = frozenset({"keepalives", "keepalives_idle", "keepalives_interval", "keepalives_count"})
+
+
+@lru_cache(maxsize=8)
 def _normalize_dsn_for_asyncpg(dsn: str) -> str:
     """
     Normalize DSN for asyncpg:
@@ -40,20 +94,15 @@ def _normalize_dsn_for_asyncpg(dsn: str) -> str:
     - Remove libpq-only keepalive params not understood by asyncpg/server
       (keepalives, keepalives_idle, keepalives_interval, keepalives_count)
     - Preserve other query params (e.g., sslmode, application_name)
+
+    Cached per input DSN; the result only depends on the string.
     """
     try:
-        if dsn.startswith("postgresql+psycopg://"):
-            dsn = "postgresql://" + dsn[len("postgresql+psycopg://"):]
+        dsn = _PSYCOPG_SCHEME.sub("postgresql://", dsn, count=1)
         parts = urlsplit(dsn)
         if parts.query:
             pairs = parse_qsl(parts.query, keep_blank_values=True)
-            filtered = []
-            skip = {"keepalives", "keepalives_idle", "keepalives_interval", "keepalives_count"}
-            for k, v in pairs:
-                if k in skip:
-                    continue
-                filtered.append((k, v))
-            new_query = urlencode(filtered)
+            new_query = urlencode([(k, v) for k, v in pairs if k not in _DSN_SKIP_PARAMS])
             dsn = urlunsplit((parts.scheme, parts.netloc, parts.path, new_query, parts.fragment))
         return dsn
     except Exception:
@@ -77,97 +126,123 @@ async def _verify_schema(pool: asyncpg.Pool) -> None:
             )
 
 
-async def ensure_thread(thread_id: str, user_id: Optional[str]) -> None:
+# Hot statements live at module level so every call sends byte-identical text and
+# reuses asyncpg's per-connection prepared statement cache (parse/plan once per
+# connection rather than per call).
+#
+# Each statement scopes itself to the caller for the thread RLS policies: its first
+# CTE runs set_config('app.user_id', ..., true), which lasts for the statement's own
+# implicit transaction. One round-trip per call, with no BEGIN/COMMIT and no separate
+# set_config. Inserts take their rows from that CTE, so the setting is in place before
+# the policy checks; reads, updates and deletes also filter on user_id explicitly,
+# so their result does not depend on when the planner evaluates it.
+_UPSERT_THREAD_SQL = """
+with u as (select set_config('app.user_id', coalesce($2::text, ''), true))
+insert into threads(id, user_id)
+select $1::text, $2::text from u
+on conflict (id) do update set updated_at = now(), user_id = coalesce(threads.user_id, excluded.user_id)
+returning user_id;
+"""
+
+# Upsert the thread (bumping updated_at) and insert the message in one statement.
+# $3::jsonb only pins the parameter type (INSERT ... SELECT cannot infer it from the
+# target column); the value is sent already encoded by the jsonb codec, so no text cast.
+_INSERT_MESSAGE_SQL = """
+with u as (select set_config('app.user_id', coalesce($4::text, ''), true)),
+t as (
+    insert into threads(id, user_id)
+    select $1::text, $4::text from u
+    on conflict (id) do update set updated_at = now(), user_id = coalesce(threads.user_id, excluded.user_id)
+    returning id
+)
+insert into thread_messages(thread_id, role, content, user_id)
+select t.id, $2::text, $3::jsonb, $4::text from t;
+"""
+
+_LOAD_MESSAGES_SQL = """
+with u as (select set_config('app.user_id', coalesce($2::text, ''), true))
+select tm.id, tm.role, tm.content, tm.created_at
+from u
+cross join thread_messages tm
+join threads t on t.id = tm.thread_id
+where tm.thread_id = $1 and t.user_id = $2
+order by tm.created_at asc, tm.id asc;
+"""
+
+# Owner check and message load in one round-trip: zero rows means no such thread; a
+# single row with a NULL message id means the thread exists but is empty or not ours.
+_LOAD_THREAD_BUNDLE_SQL = """
+with u as (select set_config('app.user_id', coalesce($2::text, ''), true))
+select t.user_id as owner, tm.id, tm.role, tm.content, tm.created_at
+from u
+cross join threads t
+left join thread_messages tm on tm.thread_id = t.id and t.user_id = $2
+where t.id = $1
+order by tm.created_at asc, tm.id asc;
+"""
+
+_DELETE_THREAD_SQL = """
+with u as (select set_config('app.user_id', coalesce($2::text, ''), true))
+delete from threads using u where id = $1 and user_id = $2
+"""
+
+_TOUCH_THREAD_SQL = """
+with u as (select set_config('app.user_id', coalesce($2::text, ''), true))
+update threads set updated_at = now() from u where id = $1 and user_id = $2
+"""
+
+_THREAD_OWNER_SQL = "select user_id from threads where id = $1"
+
+
+async def ensure_thread(thread_id: str, user_id: Optional[str]) -> Optional[str]:
+    """Create or bump the thread and return its owner (None for an unowned thread)."""
     pool = await _ensure_pool()
-    async with pool.acquire() as conn:
-        if user_id:
-            await conn.execute("select set_config('app.user_id', $1, true)", user_id)
-        await conn.execute(
-            """
-            insert into threads(id, user_id) values($1, $2)
-            on conflict (id) do update set updated_at = now(), user_id = coalesce(threads.user_id, excluded.user_id);
-            """,
-            thread_id,
-            user_id,
-        )
+    return await pool.fetchval(_UPSERT_THREAD_SQL, thread_id, user_id)
 
 
 async def insert_message(thread_id: str, role: str, content: Dict[str, Any], user_id: Optional[str]) -> None:
     pool = await _ensure_pool()
-    async with pool.acquire() as conn:
-        if user_id:
-            await conn.execute("select set_config('app.user_id', $1, true)", user_id)
-        # Ensure thread exists, then insert message
-        async with conn.transaction():
-            await conn.execute(
-                """
-                insert into threads(id, user_id) values($1, $2)
-                on conflict (id) do update set updated_at = now(), user_id = coalesce(threads.user_id, excluded.user_id);
-                """,
-                thread_id,
-                user_id,
-            )
-            payload = json.dumps(content, ensure_ascii=False)
-            await conn.execute(
-                """
-                insert into thread_messages(thread_id, role, content, user_id) values($1, $2, $3::jsonb, $4);
-                """,
-                thread_id,
-                role,
-                payload,
-                user_id,
-            )
-            await conn.execute(
-                """
-                update threads set updated_at = now() where id = $1 and user_id = $2;
-                """,
-                thread_id,
-                user_id,
-            )
+    await pool.execute(_INSERT_MESSAGE_SQL, thread_id, role, content, user_id)
 
 
-async def load_messages(thread_id: str, user_id: Optional[str]) -> List[Dict[str, Any]]:
+async def load_messages(thread_id: str, user_id: Optional[str]) -> List[MsgRow]:
     pool = await _ensure_pool()
-    async with pool.acquire() as conn:
-        if user_id:
-            await conn.execute("select set_config('app.user_id', $1, true)", user_id)
-        rows = await conn.fetch(
-            """
-            select tm.id, tm.role, tm.content, tm.created_at
-            from thread_messages tm
-            join threads t on t.id = tm.thread_id
-            where tm.thread_id = $1 and t.user_id = $2
-            order by tm.created_at asc, tm.id asc;
-            """,
-            thread_id,
-            user_id,
-        )
-        return [dict(r) for r in rows]
+    rows = await pool.fetch(_LOAD_MESSAGES_SQL, thread_id, user_id)
+    return [MsgRow._make(r) for r in rows]
+
+
+async def load_thread_bundle(
+    thread_id: str, user_id: Optional[str]
+) -> Tuple[Optional[str], List[MsgRow]]:
+    """Return (owner, messages) for a thread with a single query.
+
+    Messages are only returned when ``user_id`` owns the thread; owner is None when
+    the thread does not exist.
+    """
+    pool = await _ensure_pool()
+    rows = await pool.fetch(_LOAD_THREAD_BUNDLE_SQL, thread_id, user_id)
+    if not rows:
+        return None, []
+    owner = rows[0]["owner"]
+    if rows[0]["id"] is None:
+        return owner, []
+    return owner, [MsgRow(r["id"], r["role"], r["content"], r["created_at"]) for r in rows]
 
 
 async def delete_thread(thread_id: str, user_id: Optional[str]) -> None:
     pool = await _ensure_pool()
-    async with pool.acquire() as conn:
-        if user_id:
-            await conn.execute("select set_config('app.user_id', $1, true)", user_id)
-        await conn.execute("delete from threads where id = $1 and user_id = $2", thread_id, user_id)
+    await pool.execute(_DELETE_THREAD_SQL, thread_id, user_id)
 
 
 async def touch_thread(thread_id: str, user_id: Optional[str]) -> None:
     pool = await _ensure_pool()
-    async with pool.acquire() as conn:
-        if user_id:
-            await conn.execute("select set_config('app.user_id', $1, true)", user_id)
-        await conn.execute("update threads set updated_at = now() where id = $1 and user_id = $2", thread_id, user_id)
+    await pool.execute(_TOUCH_THREAD_SQL, thread_id, user_id)
 
 
 async def get_thread_owner(thread_id: str) -> Optional[str]:
     pool = await _ensure_pool()
     async with pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "select user_id from threads where id = $1",
-            thread_id,
-        )
+        row = await conn.fetchrow(_THREAD_OWNER_SQL, thread_id)
         if row is None:
             return None
         return row["user_id"]
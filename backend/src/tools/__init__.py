@@ -2,11 +2,35 @@
 Tools module for the financial expert backend
 
 Note: Keep this initializer lightweight to avoid importing heavy/optional
-dependencies (e.g., MySQL, Milvus) during package import. Modules should
-import needed subpackages explicitly, e.g. `from src.tools.registry import ALL_TOOLS_LIST`
+dependencies (e.g., MySQL, Milvus) during package import. Submodules are
+loaded lazily on first attribute access (PEP 562), so both
+`from src.tools.registry import ALL_TOOLS_LIST` and `from src.tools import registry`
+only pay the import cost of the submodule actually used.
 """
+import importlib
 
-# Intentionally do not import submodules here to avoid side effects on import.
-# Import explicitly from submodules where needed.
+# Submodules/subpackages resolvable as attributes; nothing is imported eagerly.
+__all__ = [
+    "date",
+    "document",
+    "kg",
+    "legacy",
+    "market",
+    "registry",
+    "sql",
+    "vector_search",
+    "vector_tool",
+    "web",
+]
 
-__all__ = [] 
\ No newline at end of file
+
+def __getattr__(name: str):
+    if name in __all__:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module  # cache so later lookups skip __getattr__
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,73 +1,90 @@
-from typing import Dict, Any, List
+import calendar
+from functools import lru_cache
+from typing import Callable, Dict, Any, List
 from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
 from langchain.tools import tool
 
 
+_WEEKDAYS: Dict[str, int] = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6
+}
+
+
+@lru_cache(maxsize=2048)
+def _parse_ymd(value: str) -> datetime:
+    # datetime is immutable, so sharing cached instances is safe
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def _parse_base(base_date: str) -> datetime:
+    # Relative bases depend on the current time and must never be cached
+    key = base_date.lower()
+    if key == "today":
+        return datetime.now()
+    if key == "yesterday":
+        return datetime.now() - timedelta(days=1)
+    return _parse_ymd(base_date)
+
+
+def _end_of_month(d: datetime) -> datetime:
+    return d.replace(day=calendar.monthrange(d.year, d.month)[1])
+
+
+def _next_weekday(d: datetime, value: Any) -> datetime:
+    days_ahead = _WEEKDAYS.get(str(value).lower(), 0) - d.weekday()
+    if days_ahead <= 0:
+        days_ahead += 7
+    return d + timedelta(days=days_ahead)
+
+
+def _previous_weekday(d: datetime, value: Any) -> datetime:
+    days_behind = d.weekday() - _WEEKDAYS.get(str(value).lower(), 0)
+    if days_behind <= 0:
+        days_behind += 7
+    return d - timedelta(days=days_behind)
+
+
+# op type -> (date, value) -> date; unknown op types are ignored
+_DATE_OPS: Dict[str, Callable[[datetime, Any], datetime]] = {
+    "add_days": lambda d, v: d + timedelta(days=v),
+    "subtract_days": lambda d, v: d - timedelta(days=v),
+    "add_weeks": lambda d, v: d + timedelta(weeks=v),
+    "subtract_weeks": lambda d, v: d - timedelta(weeks=v),
+    # Calendar-aware: Jan 31 + 1 month -> Feb 28/29, Feb 29 + 1 year -> Feb 28
+    "add_months": lambda d, v: d + relativedelta(months=v),
+    "subtract_months": lambda d, v: d - relativedelta(months=v),
+    "add_years": lambda d, v: d + relativedelta(years=v),
+    "subtract_years": lambda d, v: d - relativedelta(years=v),
+    "end_of_month": lambda d, v: _end_of_month(d),
+    "start_of_month": lambda d, v: d.replace(day=1),
+    "next_weekday": _next_weekday,
+    "previous_weekday": _previous_weekday,
+}
+
+
 class DateCalculator:
     """Date calculation utilities"""
 
     @staticmethod
     def weekday_to_index(weekday: str) -> int:
-        weekdays = {
-            "monday": 0, "mon": 0,
-            "tuesday": 1, "tue": 1,
-            "wednesday": 2, "wed": 2,
-            "thursday": 3, "thu": 3,
-            "friday": 4, "fri": 4,
-            "saturday": 5, "sat": 5,
-            "sunday": 6, "sun": 6
-        }
-        return weekdays.get(weekday.lower(), 0)
+        return _WEEKDAYS.get(weekday.lower(), 0)
 
     @staticmethod
     def calculate_date_operations(base_date: str, operations: List[Dict[str, Any]]) -> str:
         try:
-            if base_date.lower() == "today":
-                current_date = datetime.now()
-            elif base_date.lower() == "yesterday":
-                current_date = datetime.now() - timedelta(days=1)
-            else:
-                current_date = datetime.strptime(base_date, "%Y-%m-%d")
+            current_date = _parse_base(base_date)
 
             for op in operations:
-                op_type = str(op.get("type", "")).lower()
-                value = op.get("value", 0)
-
-                if op_type == "add_days":
-                    current_date += timedelta(days=value)
-                elif op_type == "subtract_days":
-                    current_date -= timedelta(days=value)
-                elif op_type == "add_weeks":
-                    current_date += timedelta(weeks=value)
-                elif op_type == "subtract_weeks":
-                    current_date -= timedelta(weeks=value)
-                elif op_type == "add_months":
-                    current_date += timedelta(days=value * 30)
-                elif op_type == "subtract_months":
-                    current_date -= timedelta(days=value * 30)
-                elif op_type == "add_years":
-                    current_date += timedelta(days=value * 365)
-                elif op_type == "subtract_years":
-                    current_date -= timedelta(days=value * 365)
-                elif op_type == "end_of_month":
-                    if current_date.month == 12:
-                        current_date = current_date.replace(year=current_date.year + 1, month=1, day=1) - timedelta(days=1)
-                    else:
-                        current_date = current_date.replace(month=current_date.month + 1, day=1) - timedelta(days=1)
-                elif op_type == "start_of_month":
-                    current_date = current_date.replace(day=1)
-                elif op_type == "next_weekday":
-                    weekday_index = DateCalculator.weekday_to_index(str(value))
-                    days_ahead = weekday_index - current_date.weekday()
-                    if days_ahead <= 0:
-                        days_ahead += 7
-                    current_date += timedelta(days=days_ahead)
-                elif op_type == "previous_weekday":
-                    weekday_index = DateCalculator.weekday_to_index(str(value))
-                    days_behind = current_date.weekday() - weekday_index
-                    if days_behind <= 0:
-                        days_behind += 7
-                    current_date -= timedelta(days=days_behind)
+                handler = _DATE_OPS.get(str(op.get("type", "")).lower())
+                if handler is not None:
+                    current_date = handler(current_date, op.get("value", 0))
 
             return current_date.strftime("%Y-%m-%d")
         except Exception:
@@ -1,23 +1,33 @@
 """
 Document processing tools for PDF classification and vector storage.
+
+Exports are resolved lazily (PEP 562): PDF worker processes import
+`pdf_parsing` from this package and must not pull in torch/transformers
+through the classifier on the way.
 """
+import importlib
+
+# Public name -> submodule defining it; nothing is imported eagerly.
+_EXPORTS = {
+    "DocumentClassifier": "classifier",
+    "PartitionManager": "partition_manager",
+    "PDFProcessor": "processor",
+    "DocumentSearchEngine": "search_engine",
+    "search_documents_tool": "document_tools",
+    "list_document_categories_tool": "document_tools",
+    "upload_pdf_tool": "document_tools",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value  # cache so later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from .classifier import DocumentClassifier
-from .partition_manager import PartitionManager
-from .processor import PDFProcessor
-from .search_engine import DocumentSearchEngine
-from .document_tools import (
-    search_documents_tool,
-    list_document_categories_tool,
-    upload_pdf_tool,
-)
 
-__all__ = [
-    "DocumentClassifier",
-    "PartitionManager", 
-    "PDFProcessor",
-    "DocumentSearchEngine",
-    "search_documents_tool",
-    "list_document_categories_tool",
-    "upload_pdf_tool",
-]
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -2,31 +2,95 @@
 LangChain tools for document processing and search.
 These tools integrate PDF processing capabilities into the LangGraph workflow.
 """
-from typing import Dict, Any, List, Optional
+import asyncio
+import base64
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from langchain.tools import tool
 
-from .search_engine import DocumentSearchEngine
+from .search_engine import DocumentSearchEngine, invalidate_semantic_cache
 from .processor import PDFProcessor
 from .classifier import DOCUMENT_CATEGORIES
+from ...core.config import settings
 
-# Global instances
+_VALID_CATS = frozenset(DOCUMENT_CATEGORIES)
+_VALID_CATS_STR = ", ".join(DOCUMENT_CATEGORIES)
+# base64 of b"%PDF-" (the first 7 chars only depend on those 5 bytes)
+_PDF_MAGIC_B64 = "JVBERi0"
+
+# (epoch, query, categories, filename, limit, user_id) -> (expires_at, response).
+# The epoch is bumped on every successful upload/delete so stale hits are never served.
+_SEARCH_CACHE: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_SEARCH_CACHE_SIZE = 512
+_SEARCH_CACHE_TTL_S = 60.0
+_CACHE_EPOCH = 0
+
+# Global instances (double-checked under a lock: construction opens Milvus pools
+# and loads the classifier, so it must happen exactly once)
 _search_engine = None
 _pdf_processor = None
+_instances_lock = threading.Lock()
+
+
+def _decode_base64_to_tempfile(data: str) -> str:
+    """Decode base64 PDF content into a temp file and return its path."""
+    content = base64.b64decode(data)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(content)
+        return tmp_file.name
+
+
+def _search_cache_get(key: Tuple) -> Optional[Dict[str, Any]]:
+    entry = _SEARCH_CACHE.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del _SEARCH_CACHE[key]
+        return None
+    _SEARCH_CACHE.move_to_end(key)
+    return dict(entry[1])
+
+
+def _search_cache_put(key: Tuple, response: Dict[str, Any]) -> None:
+    _SEARCH_CACHE[key] = (time.monotonic() + _SEARCH_CACHE_TTL_S, response)
+    _SEARCH_CACHE.move_to_end(key)
+    if len(_SEARCH_CACHE) > _SEARCH_CACHE_SIZE:
+        _SEARCH_CACHE.popitem(last=False)
+
+
+def invalidate_search_cache() -> None:
+    """Drop cached search responses; call after documents are added or removed."""
+    global _CACHE_EPOCH
+    _CACHE_EPOCH += 1
+    _SEARCH_CACHE.clear()
+    invalidate_semantic_cache()
 
 
 def get_search_engine() -> DocumentSearchEngine:
     """Get or create global search engine instance."""
     global _search_engine
-    if _search_engine is None:
-        _search_engine = DocumentSearchEngine()
+    if _search_engine is not None:
+        return _search_engine
+    
+    with _instances_lock:
+        if _search_engine is None:
+            _search_engine = DocumentSearchEngine()
     return _search_engine
 
 
 def get_pdf_processor() -> PDFProcessor:
     """Get or create global PDF processor instance."""
     global _pdf_processor
-    if _pdf_processor is None:
-        _pdf_processor = PDFProcessor()
+    if _pdf_processor is not None:
+        return _pdf_processor
+    
+    with _instances_lock:
+        if _pdf_processor is None:
+            _pdf_processor = PDFProcessor()
     return _pdf_processor
 
 
@@ -56,18 +120,29 @@ async def search_documents_tool(
         # Parse categories
         category_list = None
         if categories:
-            category_list = [cat.strip().lower() for cat in categories.split(",")]
-            # Validate categories
-            valid_categories = [cat for cat in category_list if cat in DOCUMENT_CATEGORIES]
+            # Parse and validate in one pass
+            valid_categories = [
+                cat for cat in (x.strip().lower() for x in categories.split(","))
+                if cat in _VALID_CATS
+            ]
             if valid_categories:
                 category_list = valid_categories
             else:
                 return {
                     "success": False,
-                    "error": f"Invalid categories: {categories}. Valid categories: {', '.join(DOCUMENT_CATEGORIES.keys())}",
+                    "error": f"Invalid categories: {categories}. Valid categories: {_VALID_CATS_STR}",
                     "results": []
                 }
         
+        # Identical calls within a turn (retries, planners) skip embedding + Milvus.
+        # Only user-scoped searches are cached so results never cross users.
+        cache_key = None
+        if user_id:
+            cache_key = (_CACHE_EPOCH, query, tuple(category_list or ()), filename, limit, user_id)
+            cached = _search_cache_get(cache_key)
+            if cached is not None:
+                return cached
+        
         # Perform search（若无 user_id 则不做用户级过滤）
         results = await search_engine.search_documents(
             query=query,
@@ -78,7 +153,7 @@ async def search_documents_tool(
         )
         
         if results.get("success"):
-            return {
+            response = {
                 "success": True,
                 "query": query,
                 "results": results["results"],
@@ -86,6 +161,9 @@ async def search_documents_tool(
                 "searched_categories": category_list or "all",
                 "message": f"Found {results['total_found']} relevant documents"
             }
+            if cache_key is not None:
+                _search_cache_put(cache_key, response)
+            return response
         else:
             return {
                 "success": False,
@@ -120,10 +198,10 @@ async def search_documents_by_category_tool(
         Category-specific search results
     """
     try:
-        if category.lower() not in DOCUMENT_CATEGORIES:
+        if category.lower() not in _VALID_CATS:
             return {
                 "success": False,
-                "error": f"Invalid category: {category}. Valid categories: {', '.join(DOCUMENT_CATEGORIES.keys())}",
+                "error": f"Invalid category: {category}. Valid categories: {_VALID_CATS_STR}",
                 "results": []
             }
         
@@ -268,35 +346,57 @@ async def upload_pdf_tool(
         Processing result with classification and storage information
     """
     try:
-        import base64
+        # Validate category if provided (before paying for the decode)
+        if category and category.lower() not in _VALID_CATS:
+            return {
+                "success": False,
+                "error": f"Invalid category: {category}. Valid categories: {_VALID_CATS_STR}",
+                "filename": filename
+            }
         
-        # Decode base64 content
-        try:
-            file_content = base64.b64decode(file_content_base64)
-        except Exception as e:
+        # Constant-time guards before any decoding: size implied by the base64
+        # length, and the PDF magic ("%PDF-" encodes to "JVBERi0")
+        approx_bytes = (len(file_content_base64) * 3) // 4
+        if approx_bytes > settings.max_upload_size * 1024 * 1024:
             return {
                 "success": False,
-                "error": f"Invalid base64 content: {str(e)}",
+                "error": f"File too large: ~{approx_bytes // (1024 * 1024)} MB exceeds the {settings.max_upload_size} MB limit",
+                "filename": filename
+            }
+        if not file_content_base64[:16].lstrip().startswith(_PDF_MAGIC_B64):
+            return {
+                "success": False,
+                "error": "Content is not a PDF file",
                 "filename": filename
             }
         
-        # Validate category if provided
-        if category and category.lower() not in DOCUMENT_CATEGORIES:
+        # Decode base64 content straight to a temp file in a worker thread; the
+        # decoded bytes never outlive the thread and the loop is not stalled
+        try:
+            tmp_file_path = await asyncio.to_thread(_decode_base64_to_tempfile, file_content_base64)
+        except ValueError as e:  # binascii.Error subclasses ValueError
             return {
                 "success": False,
-                "error": f"Invalid category: {category}. Valid categories: {', '.join(DOCUMENT_CATEGORIES.keys())}",
+                "error": f"Invalid base64 content: {str(e)}",
                 "filename": filename
             }
         
         # Process PDF
-        processor = get_pdf_processor()
-        result = await processor.process_pdf_content(
-            file_content=file_content,
-            filename=filename,
-            user_category=category.lower() if category else None
-        )
+        try:
+            processor = get_pdf_processor()
+            result = await processor.process_pdf_file(
+                file_path=tmp_file_path,
+                filename=filename,
+                user_category=category.lower() if category else None
+            )
+        finally:
+            try:
+                os.unlink(tmp_file_path)
+            except OSError:
+                pass
         
         if result.get("success"):
+            invalidate_search_cache()
             return {
                 "success": True,
                 "filename": result["filename"],
@@ -365,6 +465,7 @@ async def delete_document_tool(filename: str) -> Dict[str, Any]:
         result = await processor.delete_document_by_filename(filename)
         
         if result.get("success"):
+            invalidate_search_cache()
             return {
                 "success": True,
                 "filename": filename,
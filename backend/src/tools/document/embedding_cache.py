@@ -0,0 +1,64 @@
+"""
+Persistent content-addressed embedding cache.
+Maps sha256(model + text) to a float32 vector stored in SQLite, so re-uploaded
+or overlapping chunks are read from disk instead of re-embedded.
+"""
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+
+# Stay well under SQLite's default bound-parameter limit (999)
+_MAX_VARS = 500
+
+
+class EmbeddingCache:
+    """SQLite-backed (model, text) -> vector cache. Methods are blocking; call them off the event loop."""
+
+    def __init__(self, path: str, dim: int):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash TEXT PRIMARY KEY, model TEXT NOT NULL, vec BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256((model + "\x00" + text).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Vectors for the keys that are cached; entries of the wrong dimension are ignored."""
+        expected_bytes = self.dim * 4
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _MAX_VARS):
+                part = unique[start:start + _MAX_VARS]
+                rows = self._conn.execute(
+                    f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(part))})",
+                    part
+                ).fetchall()
+                for h, blob in rows:
+                    if len(blob) == expected_bytes:
+                        found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        rows = [
+            (h, model, np.asarray(vec, dtype=np.float32).tobytes())
+            for h, vec in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (hash, model, vec) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
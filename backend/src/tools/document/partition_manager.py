@@ -2,156 +2,609 @@
 Partition manager for Milvus document collections.
 Handles creation, management, and querying of document partitions.
 """
-from typing import List, Dict, Optional, Any
-from pymilvus import MilvusClient, Collection, connections, utility
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from itertools import chain, cycle
+from types import MappingProxyType
+from typing import List, Dict, Optional, Any, Sequence, Tuple, Union
+import numpy as np
+from pymilvus import MilvusClient, Collection, DataType, connections, utility
 from .classifier import DOCUMENT_CATEGORIES
+
+try:
+    from pymilvus import AsyncMilvusClient  # pymilvus >= 2.5.3
+    ASYNC_MILVUS_AVAILABLE = True
+except ImportError:
+    ASYNC_MILVUS_AVAILABLE = False
 from ...core.config import settings
 
 
+logger = logging.getLogger(__name__)
+
+# Vectors are L2-normalized on insert and query, so inner product == cosine
+# similarity without the per-candidate norm computation on the read path.
+_METRIC_TYPE = "IP"
+# Index metrics that rank unit vectors the same way as IP (scores are equal too);
+# anything else (e.g. L2) needs migrate_vector_index(allow_metric_change=True)
+_COMPATIBLE_METRICS = frozenset({"IP", "COSINE"})
+# Below this many rows use IVF_SQ8 (int8 scalar quantization, 4x fewer bytes than
+# float32, no codebook training); from here on IVF_PQ has enough data to train
+_PQ_MIN_ROWS = 50_000
+
+
+# Partition stats are served from a local cache for this long (seconds)
+_STATS_TTL_S = 30.0
+
+
+# Shared read-only stand-in for hits without dynamic fields; never handed to callers
+_EMPTY_META: Dict[str, Any] = MappingProxyType({})
+
+# Rows per client.insert RPC: as many as fit a ~32 MiB request (well under Milvus'
+# default gRPC message limit), capped at the 10k rows Milvus recommends per insert
+_INSERT_BATCH_BYTES = 32 << 20
+# Per-row bytes besides the vector: chunk text (CHUNK_TOKENS=512 cl100k tokens is
+# ~2-2.5 KB of UTF-8 for English or CJK; 1000 chars <= 3 KB without tiktoken)
+# plus scalar fields and the metadata JSON
+_INSERT_ROW_OVERHEAD_BYTES = 4096
+_INSERT_MAX_ROWS = 10_000
+# Rows fetched per query_iterator round-trip when paging a partition
+_LIST_BATCH_SIZE = 256
+
+# Hot metadata keys promoted to typed top-level columns, so filters and deletes
+# on them need not parse the metadata JSON: name -> (type, max_length, default)
+_SCALAR_FIELDS: Dict[str, Tuple[DataType, Optional[int], Any]] = {
+    "filename": (DataType.VARCHAR, 1024, ""),
+    "user_id": (DataType.VARCHAR, 256, ""),
+    "category": (DataType.VARCHAR, 64, ""),
+    "page": (DataType.INT64, None, 0),
+    "doc_id": (DataType.VARCHAR, 2048, ""),
+    "upload_ts": (DataType.INT64, None, 0),
+}
+# Scalar columns with an index (file and owner lookups)
+_INDEXED_SCALAR_FIELDS = ("filename", "user_id")
+
+# Process-wide PartitionManager per Milvus URI (see get_partition_manager)
+_shared_managers: Dict[str, "PartitionManager"] = {}
+_shared_managers_lock = threading.Lock()
+
+
+def expr_literal(value: Any) -> str:
+    """
+    Render a value as a Milvus boolean-expression literal.
+    
+    Integers are emitted bare; everything else becomes a double-quoted string
+    with quotes and backslashes escaped, so user-supplied filenames/ids cannot
+    break out of the literal.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def _chunk_key(text: str, metadata: Dict[str, Any]) -> bytes:
+    """16-byte content key: same user + file + chunk text means the same chunk."""
+    metadata = metadata or {}
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(metadata.get("user_id", "")).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(metadata.get("filename", "")).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(text).encode("utf-8"))
+    return digest.digest()
+
+
+def _hit_score(hit: Dict[str, Any]) -> float:
+    """Similarity of a search hit; MilvusClient reports it as "distance" (IP: higher is closer)."""
+    score = hit.get("distance")
+    return hit.get("score", 0.0) if score is None else score
+
+
+def _vector_storage(dtype_name: str) -> Tuple[Any, Any]:
+    """
+    (Milvus field type, numpy dtype) for the configured embedding storage dtype.
+    float16 halves vector storage and insert/search payloads (pymilvus/Milvus
+    2.4+); anything else, or an older pymilvus, stores float32.
+    """
+    if str(dtype_name).lower() in ("float16", "fp16"):
+        float16_type = getattr(DataType, "FLOAT16_VECTOR", None)
+        if float16_type is not None:
+            return float16_type, np.float16
+        logger.warning("FLOAT16_VECTOR not supported by this pymilvus; storing float32 vectors")
+    return DataType.FLOAT_VECTOR, np.float32
+
+
+def _insert_batch_rows(dim: int) -> int:
+    return max(1, min(_INSERT_MAX_ROWS, _INSERT_BATCH_BYTES // (dim * 4 + _INSERT_ROW_OVERHEAD_BYTES)))
+
+
+def _pq_subvectors(dim: int) -> int:
+    """PQ sub-quantizer count: 48 (32-dim sub-vectors at 1536-d) or the nearest divisor of dim."""
+    for m in (48, 32, 24, 16, 8, 4, 2, 1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _nlist_for(row_count: int) -> int:
+    """IVF list count: ~4*sqrt(rows), but never fewer than 39 training vectors per list."""
+    return int(max(64, min(65536, 4 * math.isqrt(row_count), row_count // 39)))
+
+
+def _index_params_for(row_count: int, dim: int) -> Dict[str, Any]:
+    """Pick the vector index for a collection of row_count vectors."""
+    if row_count < _PQ_MIN_ROWS:
+        return {"index_type": "IVF_SQ8", "params": {"nlist": _nlist_for(row_count)}}
+    return {"index_type": "IVF_PQ", "params": {"nlist": _nlist_for(row_count), "m": _pq_subvectors(dim), "nbits": 8}}
+
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _scalar_values(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Column values for _SCALAR_FIELDS taken from a chunk's metadata."""
+    metadata = metadata or {}
+    return {
+        name: (str(metadata.get(name) or default) if datatype == DataType.VARCHAR
+               else int(metadata.get(name) or default))
+        for name, (datatype, _, default) in _SCALAR_FIELDS.items()
+    }
+
+
+def _inserted_ids(result: Any) -> Optional[List[Any]]:
+    # MilvusClient.insert returns {"insert_count": n, "ids": [...]}; older clients a MutationResult
+    ids = result.get("ids") if isinstance(result, dict) else getattr(result, "primary_keys", None)
+    return list(ids) if ids is not None else None
+
+
+def connect_milvus_clients(uri: str, pool_size: Optional[int] = None) -> List[MilvusClient]:
+    """
+    Open pool_size independent MilvusClient connections to uri.
+    
+    Each client owns its own gRPC channel (with keepalive pings so idle channels
+    are not silently dropped), so concurrent RPCs are not queued behind one stream.
+    """
+    size = max(1, pool_size or settings.milvus_pool_size)
+    return [MilvusClient(uri=uri, keep_alive=True) for _ in range(size)]
+
+
 class PartitionManager:
     """Manages Milvus partitions for document categorization."""
     
-    def __init__(self, milvus_client: MilvusClient):
-        self.client = milvus_client
+    def __init__(self,
+                 milvus_client: Union[MilvusClient, Sequence[MilvusClient]],
+                 uri: Optional[str] = None):
+        # One client or a pool (see connect_milvus_clients); calls round-robin over it
+        self._clients = [milvus_client] if isinstance(milvus_client, MilvusClient) else list(milvus_client)
+        self._next_client = cycle(self._clients)
+        # Searches go through an AsyncMilvusClient for uri when pymilvus has one
+        # (created on first search, inside the running loop)
+        self._uri = uri
+        self._async_client = None
+        self._async_client_failed = not (ASYNC_MILVUS_AVAILABLE and uri)
         self.collection_name = settings.documents_collection_name or "documents"
         self.partitions = [
-            "partition_finance",
-            "partition_ai", 
-            "partition_blockchain",
-            "partition_robotics",
-            "partition_technology",
-            "partition_general"
+            sys.intern(name) for name in (
+                "partition_finance",
+                "partition_ai",
+                "partition_blockchain",
+                "partition_robotics",
+                "partition_technology",
+                "partition_general"
+            )
         ]
+        # O(1) membership checks on the per-request path
+        self._partitions_set = frozenset(self.partitions)
+        # Immutable view for per-query readers; partitions are fixed per process
+        # (one per category), so it never needs rebuilding
+        self.partitions_snapshot: Tuple[str, ...] = tuple(self.partitions)
         self.categories = DOCUMENT_CATEGORIES
+        self._category_by_partition = {
+            info["partition"]: info for info in DOCUMENT_CATEGORIES.values()
+        }
+        self.dim = settings.openai_embed_dim or 1536
+        self._vector_field_type, self._vector_np_dtype = _vector_storage(settings.embedding_storage_dtype)
+        # Current vector index type (looked up lazily); drives the SQ8 -> PQ switch
+        self._index_type: Optional[str] = None
+        # Metric of the existing vector index (searches must use it); see _read_index
+        self._metric_type: str = _METRIC_TYPE
+        self._index_lock = asyncio.Lock()
+        # Collection/partitions verified and collection loaded by this process
+        self._loaded = False
+        # Whether the collection has the _SCALAR_FIELDS columns (None = not checked yet;
+        # collections created before they existed only have the metadata JSON)
+        self._scalar_columns: Optional[bool] = None
+        # partition -> (fetched_at, stats) for reporting only; row_count is bumped on
+        # this process's inserts and may lag other workers' by up to _STATS_TTL_S
+        self._stats_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # filename -> (partition, user_id) -> primary keys inserted by this process;
+        # None once an insert did not report its ids
+        self._filename_to_ids: Dict[str, Optional[Dict[Tuple[str, str], List[int]]]] = {}
+    
+    @property
+    def client(self) -> MilvusClient:
+        """Next pooled client; each call site picks one, so concurrent RPCs spread out."""
+        return next(self._next_client)
+    
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking pymilvus call in a worker thread so the event loop keeps serving."""
+        return await asyncio.to_thread(fn, *args, **kwargs)
     
     async def ensure_collection_and_partitions(self) -> bool:
         """
         Ensure the documents collection and all partitions exist.
         Creates them if they don't exist.
         
+        Called on every upload and search; once the collection has been set up
+        and loaded by this process the call returns without any RPC.
+        
         Returns:
             True if successful, False otherwise
         """
+        if self._loaded:
+            return True
         try:
             # 1. Check if collection exists, create if not
-            collections = self.client.list_collections()
+            collections = await self._run(self.client.list_collections)
             # Optional reset for schema changes
             if settings.reset_documents_collection_on_startup and self.collection_name in collections:
                 try:
-                    self.client.drop_collection(self.collection_name)
+                    await self._run(self.client.drop_collection, self.collection_name)
                     collections = [c for c in collections if c != self.collection_name]
                 except Exception as e:
-                    print(f"[PartitionManager] Drop collection error: {e}")
+                    logger.warning("Drop collection error: %s", e)
             
             if self.collection_name not in collections:
-                self._create_documents_collection()
+                await self._run(self._create_documents_collection)
+            
+            if self._scalar_columns is None:
+                self._scalar_columns = await self._run(self._has_scalar_columns)
+                if not self._scalar_columns:
+                    logger.info(
+                        "Collection %r predates the scalar metadata columns; filtering on metadata JSON "
+                        "(recreate it via RESET_DOCUMENTS_COLLECTION_ON_STARTUP to enable them)",
+                        self.collection_name
+                    )
             
             # 2. Ensure all partitions exist
-            existing_partitions = self.client.list_partitions(self.collection_name)
+            existing_partitions = await self._run(self.client.list_partitions, self.collection_name)
             
             for partition_name in self.partitions:
                 if partition_name not in existing_partitions:
-                    self.client.create_partition(
+                    await self._run(
+                        self.client.create_partition,
                         collection_name=self.collection_name,
                         partition_name=partition_name
                     )
             
-            # 3. Load collection to make it searchable
-            self.client.load_collection(self.collection_name)
+            # 3. Load collection to make it searchable (skipped on warm restarts
+            #    where Milvus still has it loaded)
+            if not await self._run(self._is_loaded):
+                await self._run(self.client.load_collection, self.collection_name)
+            await self._run(self._read_index)
+            self._loaded = True
             
             return True
             
         except Exception as e:
-            print(f"[PartitionManager] Setup error: {e}")
+            logger.warning("Setup error: %s", e)
+            return False
+    
+    def _has_scalar_columns(self) -> bool:
+        description = self.client.describe_collection(self.collection_name)
+        names = {field.get("name") for field in description.get("fields", [])}
+        return all(name in names for name in _SCALAR_FIELDS)
+    
+    @property
+    def has_scalar_columns(self) -> bool:
+        """Whether the collection has the _SCALAR_FIELDS columns (False until checked)."""
+        return bool(self._scalar_columns)
+    
+    def field_expr(self, key: str) -> str:
+        """
+        Filter-expression operand for a metadata key: its scalar column when the
+        collection has one (indexed for filename/user_id), else the metadata
+        JSON path, which stays valid for every collection.
+        """
+        if self._scalar_columns and key in _SCALAR_FIELDS:
+            return key
+        return f'metadata[{json.dumps(key)}]'
+    
+    def _is_loaded(self) -> bool:
+        try:
+            state = self.client.get_load_state(self.collection_name).get("state")
+        except Exception:
             return False
+        return getattr(state, "name", str(state)) == "Loaded"
     
     def _create_documents_collection(self):
         """Create the documents collection with appropriate schema."""
         try:
-            # Use MilvusClient's simplified API
+            dim = self.dim
+            # Same shape as the quick-setup collection (int64 auto id, "vector",
+            # dynamic fields) but with an explicit IVF index instead of the default,
+            # plus the promoted scalar metadata columns
+            schema = MilvusClient.create_schema(auto_id=True, enable_dynamic_field=True)
+            schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+            schema.add_field(field_name="vector", datatype=self._vector_field_type, dim=dim)
+            for name, (datatype, max_length, _) in _SCALAR_FIELDS.items():
+                if max_length is None:
+                    schema.add_field(field_name=name, datatype=datatype)
+                else:
+                    schema.add_field(field_name=name, datatype=datatype, max_length=max_length)
+            
+            index_params = self.client.prepare_index_params()
+            index_params.add_index(
+                field_name="vector",
+                metric_type=_METRIC_TYPE,
+                **_index_params_for(0, dim)
+            )
+            for name in _INDEXED_SCALAR_FIELDS:
+                # Milvus picks the default scalar index for the field type
+                index_params.add_index(field_name=name)
+            self._index_type = _index_params_for(0, dim)["index_type"]
+            self._scalar_columns = True
+            
             self.client.create_collection(
                 collection_name=self.collection_name,
-                dimension=(settings.openai_embed_dim or 1536),
-                metric_type="COSINE",
-                auto_id=True,
+                schema=schema,
+                index_params=index_params,
                 description="Document collection with category-based partitions",
-                # Additional parameters for better performance
-                consistency_level="Strong",
-                enable_dynamic_field=True
+                consistency_level="Strong"
             )
             
         except Exception as e:
-            print(f"[PartitionManager] Error creating collection: {e}")
+            logger.warning("Error creating collection: %s", e)
             raise
     
     async def insert_document(self, 
                             partition_name: str,
-                            document_data: List[Dict[str, Any]]) -> bool:
+                            vectors: np.ndarray,
+                            texts: Sequence[str],
+                            metadatas: Sequence[Dict[str, Any]]) -> bool:
         """
-        Insert document data into specified partition.
+        Insert document chunks into specified partition.
+        
+        Input is columnar (row i = vectors[i], texts[i], metadatas[i]); Milvus row
+        dicts are only built per batch at the insert call. Rows are written in
+        bulk batches sized by _insert_batch_rows (one RPC each; a typical PDF is a
+        single insert); a chunk repeated within the call (same user/file/text) is
+        stored once. Nothing is deduplicated against earlier uploads: this
+        process cannot see deletes or inserts made by other workers, so a
+        re-upload is always stored.
         
         Args:
             partition_name: Target partition name
-            document_data: List of document vectors and metadata
+            vectors: Embeddings, shape (N, dim)
+            texts: Chunk texts, length N
+            metadatas: Chunk metadata dicts, length N
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            if partition_name not in self.partitions:
+            if partition_name not in self._partitions_set:
                 raise ValueError(f"Invalid partition name: {partition_name}")
             
-            # Pre-insert stats for diagnostics
+            # Pre-insert stats for diagnostics (DEBUG only: two extra RPCs per insert)
+            trace = logger.isEnabledFor(logging.DEBUG)
             prev_count = None
-            try:
-                prev_stats = self.client.get_partition_stats(
-                    collection_name=self.collection_name,
-                    partition_name=partition_name
-                )
-                prev_count = prev_stats.get("row_count", None)
-            except Exception as e:
-                print(f"[PartitionManager] Pre-insert stats fetch error: {e}")
+            if trace:
+                try:
+                    prev_stats = await self._run(
+                        self.client.get_partition_stats,
+                        collection_name=self.collection_name,
+                        partition_name=partition_name
+                    )
+                    prev_count = prev_stats.get("row_count", None)
+                except Exception as e:
+                    logger.warning("Pre-insert stats fetch error: %s", e)
 
-            # Insert data into specific partition
-            insert_result = self.client.insert(
-                collection_name=self.collection_name,
-                data=document_data,
-                partition_name=partition_name
+            if not (len(vectors) == len(texts) == len(metadatas)):
+                raise ValueError(
+                    f"Column length mismatch: vectors={len(vectors)} texts={len(texts)} metadatas={len(metadatas)}"
+                )
+            
+            # Unit-length vectors (one pass over the whole matrix) so the IP index
+            # ranks by cosine similarity; then cast to the stored vector dtype
+            normalized = _l2_normalize(np.asarray(vectors, dtype=np.float32)).astype(
+                self._vector_np_dtype, copy=False
             )
             
-            # Diagnostic: print insert result summary
-            try:
-                insert_count = getattr(insert_result, 'insert_count', None)
-                ids_preview = None
-                if hasattr(insert_result, 'primary_keys'):
-                    ids = getattr(insert_result, 'primary_keys')
-                    if isinstance(ids, list):
-                        ids_preview = ids[:3]
-                print(f"[PartitionManager] Insert result -> requested: {len(document_data)}, inserted: {insert_count}, ids_preview: {ids_preview}")
-            except Exception:
-                pass
-
-            # Post-insert stats for diagnostics
-            try:
-                post_stats = self.client.get_partition_stats(
+            inserted = skipped = 0
+            seen_in_upload = set()
+            batch_rows = _insert_batch_rows(self.dim)
+            for start in range(0, len(texts), batch_rows):
+                stop = min(start + batch_rows, len(texts))
+                
+                # Drop chunks repeated within this upload
+                fresh = []
+                for i in range(start, stop):
+                    key = _chunk_key(texts[i], metadatas[i])
+                    if key in seen_in_upload:
+                        continue
+                    seen_in_upload.add(key)
+                    fresh.append(i)
+                skipped += (stop - start) - len(fresh)
+                if not fresh:
+                    continue
+                
+                # Insert data into specific partition; rows exist only for this RPC
+                insert_result = await self._run(
+                    self.client.insert,
                     collection_name=self.collection_name,
+                    data=[
+                        {
+                            "vector": normalized[i],
+                            "text": texts[i],
+                            "metadata": metadatas[i],
+                            **(_scalar_values(metadatas[i]) if self._scalar_columns else {}),
+                        }
+                        for i in fresh
+                    ],
                     partition_name=partition_name
                 )
-                post_count = post_stats.get("row_count", None)
-                print(f"[PartitionManager] Partition '{partition_name}' row_count: before={prev_count}, after={post_count}")
-            except Exception as e:
-                print(f"[PartitionManager] Post-insert stats fetch error: {e}")
+                inserted += len(fresh)
+                ids = _inserted_ids(insert_result)
+                if ids is not None and len(ids) != len(fresh):
+                    ids = None
+                for n, i in enumerate(fresh):
+                    meta = metadatas[i] or {}
+                    filename = meta.get("filename", "")
+                    if filename:
+                        self._remember_id(filename, partition_name, meta.get("user_id", ""), ids[n] if ids is not None else None)
+                
+                if trace:
+                    # Diagnostic: insert result summary
+                    try:
+                        insert_count = getattr(insert_result, 'insert_count', None)
+                        ids_preview = None
+                        if hasattr(insert_result, 'primary_keys'):
+                            ids = getattr(insert_result, 'primary_keys')
+                            if isinstance(ids, list):
+                                ids_preview = ids[:3]
+                        logger.debug("Insert result -> requested=%d inserted=%s ids_preview=%s", len(fresh), insert_count, ids_preview)
+                    except Exception:
+                        pass
+            
+            # Keep cached stats current without another RPC
+            cached = self._stats_cache.get(partition_name)
+            if cached is not None and inserted:
+                fetched_at, cached_stats = cached
+                self._stats_cache[partition_name] = (
+                    fetched_at,
+                    {**cached_stats, "row_count": int(cached_stats.get("row_count", 0)) + inserted}
+                )
+            
+            if trace:
+                # Post-insert stats for diagnostics
+                try:
+                    post_stats = await self._run(
+                        self.client.get_partition_stats,
+                        collection_name=self.collection_name,
+                        partition_name=partition_name
+                    )
+                    post_count = post_stats.get("row_count", None)
+                    logger.debug("Partition %r row_count: before=%s after=%s", partition_name, prev_count, post_count)
+                except Exception as e:
+                    logger.warning("Post-insert stats fetch error: %s", e)
 
-            print(f"[PartitionManager] Inserted {len(document_data)} documents into {partition_name}")
+            logger.info("Inserted %d documents into %s (skipped %d repeated in upload)", inserted, partition_name, skipped)
+            
             return True
             
         except Exception as e:
-            print(f"[PartitionManager] Insert error: {e}")
+            logger.warning("Insert error: %s", e)
             return False
     
+    def forget_filename(self, filename: str) -> None:
+        """Drop the recorded primary keys of a deleted file."""
+        self._filename_to_ids.pop(filename, None)
+    
+    def _remember_id(self, filename: str, partition_name: str, user_id: str, pk: Optional[int]) -> None:
+        if pk is None:
+            # Ids of this file are no longer fully known: deletes must use a filter
+            self._filename_to_ids[filename] = None
+            return
+        if filename in self._filename_to_ids and self._filename_to_ids[filename] is None:
+            return
+        by_owner = self._filename_to_ids.setdefault(filename, {})
+        by_owner.setdefault((partition_name, user_id), []).append(pk)
+    
+    def ids_for_filename(self, filename: str, user_id: Optional[str] = None) -> Optional[Dict[str, List[int]]]:
+        """
+        Primary keys of filename's chunks grouped by partition (only user_id's
+        chunks when given).
+        
+        The index only covers chunks inserted by this process (not earlier runs
+        or other workers), so it can only add to a filter delete, never replace
+        it; None means not even this process's ids are known.
+        """
+        by_owner = self._filename_to_ids.get(filename)
+        if by_owner is None:
+            return None
+        grouped: Dict[str, List[int]] = {}
+        for (partition, owner), pks in by_owner.items():
+            if not user_id or owner == user_id:
+                grouped.setdefault(partition, []).extend(pks)
+        return grouped
+    
+    def _read_index(self) -> None:
+        """Record the vector index type and metric; a metric searches cannot use is logged loudly."""
+        info = self.client.describe_index(self.collection_name, index_name="vector") or {}
+        self._index_type = info.get("index_type")
+        self._metric_type = info.get("metric_type") or _METRIC_TYPE
+        if self._metric_type not in _COMPATIBLE_METRICS:
+            logger.error(
+                "Collection %r vector index uses metric %s; searches are disabled until "
+                "migrate_vector_index(allow_metric_change=True) rebuilds it with %s",
+                self.collection_name, self._metric_type, _METRIC_TYPE
+            )
+    
+    async def migrate_vector_index(self, allow_metric_change: bool = False) -> Dict[str, Any]:
+        """
+        Switch the vector index to the type and nlist sized for the current row
+        count (see _index_params_for). Startup/admin step only, never the request
+        path: Milvus keeps a single index per field, so the collection is released
+        while the replacement builds and searches fail until it is loaded again.
+        
+        An index whose metric is not IP/COSINE is only replaced when
+        allow_metric_change is set; otherwise a ValueError reports the mismatch.
+        
+        Returns:
+            {"changed", "index_type", "metric_type", "row_count"}
+        """
+        async with self._index_lock:
+            return await self._run(self._migrate_vector_index, allow_metric_change)
+    
+    def _migrate_vector_index(self, allow_metric_change: bool) -> Dict[str, Any]:
+        self._read_index()
+        if self._metric_type not in _COMPATIBLE_METRICS and not allow_metric_change:
+            raise ValueError(
+                f"Vector index metric is {self._metric_type}, expected {_METRIC_TYPE}; "
+                "pass allow_metric_change=True to rebuild it"
+            )
+        
+        # Milvus indexes are per collection, so the choice follows the total row
+        # count across all category partitions
+        row_count = int(self.client.get_collection_stats(self.collection_name).get("row_count", 0))
+        wanted = _index_params_for(row_count, self.dim)
+        result = {"changed": False, "index_type": self._index_type, "metric_type": self._metric_type, "row_count": row_count}
+        if wanted["index_type"] == self._index_type and self._metric_type in _COMPATIBLE_METRICS:
+            return result
+        
+        logger.info(
+            "Rebuilding index %s/%s -> %s/%s (nlist=%d) at %d rows",
+            self._index_type, self._metric_type, wanted["index_type"], _METRIC_TYPE,
+            wanted["params"]["nlist"], row_count
+        )
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(field_name="vector", metric_type=_METRIC_TYPE, **wanted)
+        # Until the reload succeeds, ensure_collection_and_partitions must re-check
+        self._loaded = False
+        self.client.release_collection(self.collection_name)
+        self.client.drop_index(self.collection_name, index_name="vector")
+        self.client.create_index(self.collection_name, index_params)
+        self.client.load_collection(self.collection_name)
+        self._index_type = wanted["index_type"]
+        self._metric_type = _METRIC_TYPE
+        self._loaded = True
+        return {**result, "changed": True, "index_type": self._index_type, "metric_type": self._metric_type}
+    
     async def search_partitions(self, 
                               query_vector: List[float],
-                              partitions: Optional[List[str]] = None,
+                              partitions: Optional[Sequence[str]] = None,
                               limit: int = 5,
                               filter_expr: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -169,15 +622,28 @@ class PartitionManager:
         try:
             search_partitions = partitions or self.partitions
             
-            # Validate partition names
-            valid_partitions = [p for p in search_partitions if p in self.partitions]
+            # Validate partition names. Every requested partition is searched: cached
+            # stats only see this process's inserts, so a partition that looks empty
+            # here may already hold rows written by another worker
+            valid_partitions = [p for p in search_partitions if p in self._partitions_set]
             if not valid_partitions:
                 return []
+            if self._metric_type not in _COMPATIBLE_METRICS:
+                logger.error("Search skipped: vector index metric %s needs migrate_vector_index", self._metric_type)
+                return []
             
+            # One float32 copy of the query, normalized in place and handed to
+            # pymilvus as an ndarray (no per-element Python float boxing), in the
+            # same dtype as the stored vector field.
+            query = np.array(query_vector, dtype=np.float32)
+            norm = float(np.linalg.norm(query))
+            if norm:
+                query /= norm
+            query = query.astype(self._vector_np_dtype, copy=False)
             search_params = {
                 "collection_name": self.collection_name,
-                "data": [query_vector],
-                "search_params": {"metric_type": "COSINE", "nprobe": 10},
+                "data": [query],
+                "search_params": {"metric_type": self._metric_type, "params": {"nprobe": settings.milvus_nprobe}},
                 "limit": limit,
                 "output_fields": ["$meta"],
                 "partition_names": valid_partitions,
@@ -188,50 +654,68 @@ class PartitionManager:
                 search_params["filter"] = filter_expr
 
             # TRACE：打印最终 Milvus 搜索参数摘要（不包含向量内容）
-            try:
-                from ...core.config import settings as _settings  # lazy import; avoid top-level import
-                if getattr(_settings, 'trace_events', False):
-                    print(f"[PartitionManager] search partitions={valid_partitions} limit={limit} filter={filter_expr}")
-            except Exception:
-                pass
-            
-            results = self.client.search(**search_params)
-            
-            return self._process_search_results(results)
+            logger.debug("search partitions=%s limit=%d filter=%s", valid_partitions, limit, filter_expr)
+            
+            if len(valid_partitions) == 1:
+                results = await self._search(**search_params)
+                return self._process_search_results(results)
+            
+            # Fan out one RPC per partition concurrently (on the async client, or a
+            # worker thread each) and k-way merge the per-partition top-k
+            per_partition = await asyncio.gather(*(
+                self._search(**{**search_params, "partition_names": [p]})
+                for p in valid_partitions
+            ))
+            hits = chain.from_iterable(res[0] for res in per_partition if res)
+            merged = heapq.nlargest(limit, hits, key=_hit_score)
+            return self._process_search_results([merged])
             
         except Exception as e:
-            print(f"[PartitionManager] Search error: {e}")
+            logger.warning("Search error: %s", e)
             return []
     
+    def _get_async_client(self):
+        if self._async_client is None and not self._async_client_failed:
+            try:
+                self._async_client = AsyncMilvusClient(uri=self._uri)
+            except Exception as e:
+                logger.warning("AsyncMilvusClient unavailable, searching via thread pool: %s", e)
+                self._async_client_failed = True
+        return self._async_client
+    
+    async def _search(self, **params) -> Any:
+        """One search RPC: awaited on the async client when available, else a pooled sync client in a thread."""
+        client = self._get_async_client()
+        if client is not None:
+            return await client.search(**params)
+        return await self._run(self.client.search, **params)
+    
     def _process_search_results(self, results: List[List[Dict]]) -> List[Dict[str, Any]]:
         """Process and format search results."""
-        processed_results = []
-        
+        # results is a list of lists (one list per query); hits without an entity are skipped
+        flat = (hit for result_list in results for hit in result_list if "entity" in hit)
         try:
-            # results is a list of lists (one list per query)
-            for result_list in results:
-                for result in result_list:
-                    if "entity" in result:
-                        entity = result["entity"]
-                        meta = entity.get("$meta", {}) if isinstance(entity, dict) else {}
-                        # 规范解包：text 在 $meta["text"]；业务元数据在 $meta["metadata"]
-                        meta_metadata = {}
-                        if isinstance(meta, dict):
-                            meta_metadata = meta.get("metadata", {}) if isinstance(meta.get("metadata"), dict) else {}
-                        # Build backward-compatible shape
-                        processed_results.append({
-                            "text": meta.get("text", entity.get("text", "")),
-                            "metadata": meta_metadata if meta_metadata else entity.get("metadata", {}),
-                            "score": result.get("score", 0.0),
-                            "id": result.get("id", "")
-                        })
-            
+            # 规范解包：text 在 $meta["text"]；业务元数据在 $meta["metadata"]
+            # Build backward-compatible shape
+            return [
+                {
+                    "text": meta.get("text", entity.get("text", "")),
+                    "metadata": meta_metadata if meta_metadata and isinstance(meta_metadata, dict) else entity.get("metadata", {}),
+                    "score": _hit_score(hit),
+                    "id": hit.get("id", "")
+                }
+                for hit in flat
+                for entity in (hit["entity"],)
+                for meta in (entity.get("$meta") or _EMPTY_META,)
+                for meta_metadata in (meta.get("metadata"),)
+            ]
         except Exception as e:
-            print(f"[PartitionManager] Result processing error: {e}")
-        
-        return processed_results
+            logger.warning("Result processing error: %s", e)
+            return []
     
-    async def delete_document(self, document_id: str, partition_name: Optional[str] = None) -> bool:
+    async def delete_document(self,
+                            document_id: str,
+                            partition_name: Optional[str] = None) -> bool:
         """
         Delete a document by ID.
         
@@ -243,23 +727,41 @@ class PartitionManager:
             True if successful, False otherwise
         """
         try:
+            # Primary keys are INT64; fall back to a quoted literal for anything else
+            try:
+                pk: Any = int(document_id)
+            except (TypeError, ValueError):
+                pk = document_id
             delete_params = {
                 "collection_name": self.collection_name,
-                "expr": f"id == '{document_id}'"
+                "filter": f"id == {expr_literal(pk)}"
             }
-            
             if partition_name:
-                delete_params["partition_names"] = [partition_name]
+                delete_params["partition_name"] = partition_name
             
-            result = self.client.delete(**delete_params)
+            result = await self._run(self.client.delete, **delete_params)
             
-            print(f"[PartitionManager] Deleted document: {document_id}")
+            logger.info("Deleted document: %s", document_id)
             return True
             
         except Exception as e:
-            print(f"[PartitionManager] Delete error: {e}")
+            logger.warning("Delete error: %s", e)
             return False
     
+    async def _partition_stats_cached(self, partition_name: str) -> Dict[str, Any]:
+        """Partition stats, refreshed from Milvus at most once per _STATS_TTL_S."""
+        cached = self._stats_cache.get(partition_name)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < _STATS_TTL_S:
+            return cached[1]
+        stats = await self._run(
+            self.client.get_partition_stats,
+            collection_name=self.collection_name,
+            partition_name=partition_name
+        )
+        self._stats_cache[partition_name] = (now, stats)
+        return stats
+    
     async def get_partition_stats(self) -> Dict[str, Any]:
         """
         Get statistics for all partitions.
@@ -273,36 +775,31 @@ class PartitionManager:
         }
         
         try:
-            for partition_name in self.partitions:
-                try:
-                    # Get partition info
-                    partition_stats = self.client.get_partition_stats(
-                        collection_name=self.collection_name,
-                        partition_name=partition_name
-                    )
-                    
-                    # Find category info
-                    category_info = None
-                    for category, info in self.categories.items():
-                        if info["partition"] == partition_name:
-                            category_info = info
-                            break
-                    
-                    stats["partitions"][partition_name] = {
-                        "row_count": partition_stats.get("row_count", 0),
-                        "category_name": category_info["name"] if category_info else "Unknown",
-                        "description": category_info["description"] if category_info else ""
-                    }
-                    
-                except Exception as e:
-                    print(f"[PartitionManager] Error getting stats for {partition_name}: {e}")
+            # Cold/stale partitions are fetched concurrently (one round-trip of
+            # latency, not one per partition); fresh ones come from the TTL cache
+            results = await asyncio.gather(
+                *(self._partition_stats_cached(p) for p in self.partitions),
+                return_exceptions=True
+            )
+            for partition_name, partition_stats in zip(self.partitions, results):
+                if isinstance(partition_stats, Exception):
+                    logger.warning("Error getting stats for %s: %s", partition_name, partition_stats)
                     stats["partitions"][partition_name] = {
                         "row_count": 0,
-                        "error": str(e)
+                        "error": str(partition_stats)
                     }
+                    continue
+                
+                # Find category info
+                category_info = self._category_by_partition.get(partition_name)
+                stats["partitions"][partition_name] = {
+                    "row_count": partition_stats.get("row_count", 0),
+                    "category_name": category_info["name"] if category_info else "Unknown",
+                    "description": category_info["description"] if category_info else ""
+                }
             
         except Exception as e:
-            print(f"[PartitionManager] Error getting partition stats: {e}")
+            logger.warning("Error getting partition stats: %s", e)
             stats["error"] = str(e)
         
         return stats
@@ -323,10 +820,24 @@ class PartitionManager:
             List of document metadata
         """
         try:
-            if partition_name not in self.partitions:
+            if partition_name not in self._partitions_set:
                 raise ValueError(f"Invalid partition name: {partition_name}")
             
-            results = self.client.query(
+            return await self._run(self._list_page, self.client, partition_name, limit, offset)
+            
+        except Exception as e:
+            logger.warning("List documents error: %s", e)
+            return []
+    
+    def _list_page(self, client: MilvusClient, partition_name: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """
+        One page of a partition, read through a query iterator (pk-ordered, fixed
+        memory per batch, no server-side offset+limit window). Runs in a worker
+        thread; clients without query_iterator fall back to query(limit, offset).
+        """
+        query_iterator = getattr(client, "query_iterator", None)
+        if query_iterator is None:
+            return client.query(
                 collection_name=self.collection_name,
                 filter="",  # No filter, get all documents
                 output_fields=["id", "metadata"],
@@ -334,12 +845,29 @@ class PartitionManager:
                 limit=limit,
                 offset=offset
             )
-            
-            return results
-            
-        except Exception as e:
-            print(f"[PartitionManager] List documents error: {e}")
-            return []
+        
+        iterator = query_iterator(
+            collection_name=self.collection_name,
+            batch_size=_LIST_BATCH_SIZE,
+            filter="",
+            output_fields=["id", "metadata"],
+            partition_names=[partition_name]
+        )
+        page: List[Dict[str, Any]] = []
+        to_skip = offset
+        try:
+            while len(page) < limit:
+                batch = iterator.next()
+                if not batch:
+                    break
+                if to_skip >= len(batch):
+                    to_skip -= len(batch)
+                    continue
+                page.extend(batch[to_skip:to_skip + limit - len(page)])
+                to_skip = 0
+        finally:
+            iterator.close()
+        return page
     
     def get_partition_for_category(self, category: str) -> Optional[str]:
         """
@@ -386,14 +914,15 @@ class PartitionManager:
         
         try:
             # Check collection existence
-            collections = self.client.list_collections()
+            collections = await self._run(self.client.list_collections)
             health_info["collection_exists"] = self.collection_name in collections
             
             if health_info["collection_exists"]:
                 # Check if collection is loaded
                 try:
                     # Try a simple query to check if loaded
-                    self.client.query(
+                    await self._run(
+                        self.client.query,
                         collection_name=self.collection_name,
                         filter="",
                         limit=1
@@ -403,7 +932,7 @@ class PartitionManager:
                     health_info["collection_loaded"] = False
                 
                 # Check partitions
-                existing_partitions = self.client.list_partitions(self.collection_name)
+                existing_partitions = await self._run(self.client.list_partitions, self.collection_name)
                 for partition_name in self.partitions:
                     health_info["partitions_status"][partition_name] = partition_name in existing_partitions
                 
@@ -418,3 +947,22 @@ class PartitionManager:
             health_info["error"] = str(e)
         
         return health_info
+
+
+def get_partition_manager(uri: str) -> PartitionManager:
+    """
+    Process-wide PartitionManager for uri, over one connect_milvus_clients pool.
+    
+    Every PDFProcessor and DocumentSearchEngine shares it, so extra instances reuse
+    the open gRPC channels instead of connecting again, and upload/delete
+    bookkeeping (dedup keys, filename -> ids) is the same whichever instance
+    handles the request.
+    """
+    manager = _shared_managers.get(uri)
+    if manager is not None:
+        return manager
+    
+    with _shared_managers_lock:
+        if uri not in _shared_managers:
+            _shared_managers[uri] = PartitionManager(connect_milvus_clients(uri), uri=uri)
+    return _shared_managers[uri]
@@ -0,0 +1,366 @@
+"""
+PDF parsing and chunking that runs in the shared PDF worker process pool.
+
+Spawned workers import this module to unpickle the functions they run, so it
+must stay lightweight: pypdf/PyMuPDF/tiktoken and settings only, never torch,
+transformers, LangChain or the Milvus client.
+"""
+import multiprocessing
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from pypdf import PdfReader
+from ...core.config import settings
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Layout heuristics for the PyMuPDF path: a short line set noticeably larger than
+# the page's dominant body font starts a new section
+_HEADING_SCALE = 1.15
+_HEADING_MAX_CHARS = 120
+# Chunk size/overlap in characters, used when token-sized chunks are off (CHUNK_TOKENS=0)
+_CHUNK_SIZE = 1000
+_CHUNK_OVERLAP = 200
+# Chunk boundaries, one group per preference level: paragraph, line, sentence, word
+_SPLITTER_RE = re.compile(r"(\n\n)|(\n)|([。！？.])|( )")
+
+# Text-extraction patterns, compiled once at import
+_ABSTRACT_PATTERNS = tuple(re.compile(p) for p in (
+    r"abstract\s*:?\s*\n",
+    r"摘\s*要\s*:?\s*\n",
+    r"summary\s*:?\s*\n",
+    r"概\s*述\s*:?\s*\n",
+    r"résumé\s*:?\s*\n"
+))
+_ABSTRACT_ANY = re.compile("|".join(p.pattern for p in _ABSTRACT_PATTERNS))
+_ABSTRACT_WINDOW = 500
+_ABSTRACT_END_PATTERNS = tuple(re.compile(p) for p in (
+    r"\n\s*1\.", r"\nintroduction", r"\n引言",
+    r"\nkeywords", r"\n关键词", r"\nkey\s*words"
+))
+# One alternation instead of three passes over the text
+_KEYWORDS_PATTERN = re.compile(r"(?:keywords?|关键词|key\s*words?)\s*:?\s*(.{1,300})")
+_WHITESPACE = re.compile(r"\s+")
+_YEAR = re.compile(r"\d{4}")
+
+
+# ===== Worker pool =====
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        # spawn: never fork a process that may already hold torch/tokenizer threads.
+        # Each worker is a full interpreter, so keep the count small (PDF_WORKERS)
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.pdf_workers),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pdf_pool
+
+
+# ===== Abstract extraction (classifier input) =====
+def _extract_abstract_section(content: str, content_lower: Optional[str] = None) -> str:
+    """Extract abstract section from document content."""
+    if content_lower is None:
+        content_lower = content.lower()
+    
+    for pattern in _ABSTRACT_PATTERNS:
+        match = pattern.search(content_lower)
+        if match:
+            start_pos = match.end()
+            # Extract abstract content (next 500 characters)
+            abstract_text = content[start_pos:start_pos + _ABSTRACT_WINDOW]
+            abstract_lower = content_lower[start_pos:start_pos + _ABSTRACT_WINDOW]
+            
+            # Find abstract end markers
+            min_end = len(abstract_text)
+            for end_pattern in _ABSTRACT_END_PATTERNS:
+                end_match = end_pattern.search(abstract_lower)
+                if end_match and end_match.start() > 50:
+                    min_end = min(min_end, end_match.start())
+            
+            result = abstract_text[:min_end].strip()
+            if len(result) > 50:  # Ensure we have substantial content
+                return result
+    
+    return ""
+
+
+def _extract_keywords_and_title(content: str, content_lower: Optional[str] = None) -> str:
+    """Extract title and keywords from document content."""
+    if content_lower is None:
+        content_lower = content.lower()
+    lines = content.split('\n')[:15]  # Check first 15 lines
+    extracted_parts = []
+    
+    # 1. Extract title (usually in first few lines)
+    for line in lines:
+        line = line.strip()
+        if 10 < len(line) < 200 and not line.lower().startswith(('page', 'doi:', 'http', 'www')):
+            # Simple heuristic to identify titles
+            if not _YEAR.search(line):  # Avoid lines with years
+                extracted_parts.append(f"Title: {line}")
+                break
+    
+    # 2. Extract keywords section
+    match = _KEYWORDS_PATTERN.search(content_lower)
+    if match:
+        # Clean up keywords (remove newlines, extra spaces)
+        keywords = _WHITESPACE.sub(' ', match.group(1).strip())
+        if len(keywords) > 10:
+            extracted_parts.append(f"Keywords: {keywords}")
+    
+    # 3. If nothing found, extract first meaningful paragraph
+    if not extracted_parts:
+        for line in lines:
+            line = line.strip()
+            if len(line) > 100:  # Find a substantial line
+                extracted_parts.append(line[:200])
+                break
+    
+    return " | ".join(extracted_parts)
+
+
+
+def _extract_pdf_abstract_sync(pdf_path: str) -> str:
+    """Extract abstract and keywords from PDF (module-level so it can be pickled)."""
+    try:
+        # Parse at most the first 2 pages, lazily; stop after page 1 when it
+        # already holds an abstract marker plus its full extraction window
+        reader = PdfReader(pdf_path)
+        full_content = ""
+        content_lower = ""  # lowered incrementally, once per page, and reused below
+        for page in reader.pages[:2]:
+            page_text = page.extract_text() or ""
+            full_content += page_text
+            content_lower += page_text.lower()
+            marker = _ABSTRACT_ANY.search(content_lower)
+            if marker and marker.end() + _ABSTRACT_WINDOW <= len(full_content):
+                break
+        
+        if not full_content:
+            return ""
+        
+        # 1. Try to extract abstract section
+        abstract = _extract_abstract_section(full_content, content_lower)
+        if abstract:
+            return abstract
+        
+        # 2. Try to extract keywords and title
+        keywords_title = _extract_keywords_and_title(full_content, content_lower)
+        if keywords_title:
+            return keywords_title
+        
+        # 3. Fallback to first 300 characters
+        return full_content[:300].strip()
+        
+    except Exception:
+        return ""
+
+
+# ===== Chunking (processor input) =====
+@lru_cache(maxsize=1)
+def _get_chunk_encoding():
+    """cl100k_base when token-sized chunks are configured (and tiktoken works), else None."""
+    if not (TIKTOKEN_AVAILABLE and settings.chunk_tokens > 0):
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"[pdf_parsing] tiktoken encoding unavailable, chunking by characters: {e}")
+        return None
+
+
+def _chunk_limits() -> Tuple[int, int]:
+    """(chunk size, overlap) in the unit _text_length measures: tokens or characters."""
+    if _get_chunk_encoding() is None:
+        return _CHUNK_SIZE, _CHUNK_OVERLAP
+    return settings.chunk_tokens, max(0, settings.chunk_overlap_tokens)
+
+
+def _text_length(text: str) -> int:
+    encoding = _get_chunk_encoding()
+    if encoding is None:
+        return len(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_text(text: str) -> List[str]:
+    """
+    Split text into windows of at most the chunk size, overlapping by about the
+    chunk overlap, both counted in tokens (characters without tiktoken, see
+    _chunk_limits). Each window is cut at its last boundary, preferring
+    paragraph, then line, then sentence, then word breaks (hard cut if none);
+    boundaries come from one pass of _SPLITTER_RE and are picked by bisection.
+    """
+    text = text.strip()
+    chunk_size, chunk_overlap = _chunk_limits()
+    encoding = _get_chunk_encoding()
+    if encoding is None:
+        if len(text) <= chunk_size:
+            return [text] if text else []
+        
+        def _advance(pos: int, n: int) -> int:
+            # Offset n characters after (or before) pos
+            return min(max(pos + n, 0), len(text))
+    else:
+        # Character offset where each token starts, from a single encode
+        _, token_starts = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+        if len(token_starts) <= chunk_size:
+            return [text] if text else []
+        
+        def _advance(pos: int, n: int) -> int:
+            # Offset n tokens after (or before) the token containing pos
+            t = bisect_right(token_starts, pos) - 1 + n
+            return len(text) if t >= len(token_starts) else token_starts[max(t, 0)]
+    
+    # Boundary end offsets per preference level, plus all of them in order
+    ends: Tuple[List[int], ...] = ([], [], [], [])
+    all_ends: List[int] = []
+    for match in _SPLITTER_RE.finditer(text):
+        ends[match.lastindex - 1].append(match.end())
+        all_ends.append(match.end())
+    
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        limit = _advance(start, chunk_size)
+        cut = limit
+        if limit < len(text):
+            # Past the overlap, so the next window always moves forward
+            min_cut = _advance(start, chunk_overlap)
+            for level in ends:
+                j = bisect_right(level, limit) - 1
+                if j >= 0 and level[j] > min_cut:
+                    cut = level[j]
+                    break
+        cut = max(cut, start + 1)
+        piece = text[start:cut].strip()
+        if piece:
+            chunks.append(piece)
+        if cut >= len(text):
+            break
+        # Next window starts about chunk_overlap back, on a boundary if there is one
+        back = _advance(cut, -chunk_overlap)
+        j = bisect_left(all_ends, back)
+        next_start = all_ends[j] if j < len(all_ends) and all_ends[j] < cut else back
+        start = max(next_start, start + 1)
+    return chunks
+
+
+def _parse_and_split(file_path: str) -> List[Tuple[int, str]]:
+    """
+    Parse a PDF and split it into (page, chunk_text) pieces. Runs in the PDF
+    worker pool; pure CPU, no I/O besides reading the file.
+    """
+    if PYMUPDF_AVAILABLE:
+        return _split_sections(_extract_sections_pymupdf(file_path))
+    
+    # Split each page's text into chunks (pages are 0-based, as before)
+    return [
+        (page_no, part)
+        for page_no, page in enumerate(PdfReader(file_path).pages)
+        for part in _split_text(page.extract_text() or "")
+    ]
+
+
+def _split_sections(sections: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """
+    Turn layout sections into chunks: consecutive small sections are packed
+    together up to the chunk size, and only oversized sections go through the
+    boundary splitter.
+    """
+    chunk_size, _ = _chunk_limits()
+    joiner_len = _text_length("\n\n")
+    pieces: List[Tuple[int, str]] = []
+    buffer: List[str] = []
+    buffer_len = 0
+    buffer_page = 0
+    
+    def _flush():
+        nonlocal buffer, buffer_len
+        if buffer:
+            pieces.append((buffer_page, "\n\n".join(buffer)))
+        buffer = []
+        buffer_len = 0
+    
+    for page, text in sections:
+        length = _text_length(text)
+        if length > chunk_size:
+            _flush()
+            pieces.extend((page, part) for part in _split_text(text))
+            continue
+        if buffer_len + length + joiner_len > chunk_size:
+            _flush()
+        if not buffer:
+            buffer_page = page
+        buffer.append(text)
+        buffer_len += length + joiner_len
+    _flush()
+    return pieces
+
+
+def _extract_sections_pymupdf(file_path: str) -> List[Tuple[int, str]]:
+    """
+    Heuristic layout parse with PyMuPDF: text blocks become paragraphs, and a
+    short line in a larger-than-body font starts a new section. Returns
+    (page, section_text) pairs in reading order.
+    """
+    sections: List[Tuple[int, str]] = []
+    current: List[str] = []
+    current_page = 0
+    
+    def _flush_section():
+        nonlocal current
+        text = "\n\n".join(current).strip()
+        if text:
+            sections.append((current_page, text))
+        current = []
+    
+    with fitz.open(file_path) as doc:
+        for page_no, page in enumerate(doc):
+            blocks = [b for b in page.get_text("dict")["blocks"] if b.get("type", 0) == 0]
+            sizes = [
+                round(span["size"])
+                for block in blocks for line in block["lines"] for span in line["spans"]
+                if span["text"].strip()
+            ]
+            if not sizes:
+                continue
+            body_size = Counter(sizes).most_common(1)[0][0]
+            
+            for block in blocks:
+                paragraph: List[str] = []
+                for line in block["lines"]:
+                    text = "".join(span["text"] for span in line["spans"]).strip()
+                    if not text:
+                        continue
+                    size = max(span["size"] for span in line["spans"])
+                    if size >= body_size * _HEADING_SCALE and len(text) <= _HEADING_MAX_CHARS:
+                        if paragraph:
+                            current.append("\n".join(paragraph))
+                            paragraph = []
+                        _flush_section()
+                        current_page = page_no
+                    elif not current and not paragraph:
+                        current_page = page_no
+                    paragraph.append(text)
+                if paragraph:
+                    current.append("\n".join(paragraph))
+    _flush_section()
+    return sections
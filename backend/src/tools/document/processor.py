@@ -3,19 +3,49 @@ PDF document processor with intelligent classification and vector storage.
 Handles PDF parsing, text chunking, embedding generation, and Milvus storage.
 """
 import asyncio
+import logging
 import os
 import tempfile
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+import numpy as np
 from langchain_openai import OpenAIEmbeddings
-from pymilvus import MilvusClient
 
 from .classifier import DocumentClassifier
-from .partition_manager import PartitionManager
+from .embedding_cache import EmbeddingCache
+from .partition_manager import expr_literal, get_partition_manager
+from .pdf_parsing import _get_pdf_pool, _parse_and_split
 from ...core.config import get_milvus_config, settings
 
+logger = logging.getLogger(__name__)
+
+# Chunks whose SimHash signatures differ in at most this many bits share one embedding
+_NEAR_DUP_BITS = 3
+
+_embeddings_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _embeddings_for(api_key: str, base_url: Optional[str], model: str) -> OpenAIEmbeddings:
+    return OpenAIEmbeddings(openai_api_key=api_key, base_url=base_url, model=model)
+
+
+def get_embeddings(default_model: str) -> Optional[OpenAIEmbeddings]:
+    """
+    Process-wide OpenAIEmbeddings for the configured credentials (None without an
+    API key). Instances share one client and its HTTP connection pool instead of
+    opening a new one each.
+    """
+    # Prefer embeddings-specific credentials if provided
+    api_key = settings.openai_embed_api_key or settings.openai_api_key
+    if not api_key:
+        return None
+    base_url = settings.openai_embed_base_url or settings.openai_base_url
+    with _embeddings_lock:
+        return _embeddings_for(api_key, base_url, settings.openai_embed_model or default_model)
+
 
 class PDFProcessor:
     """
@@ -30,14 +60,9 @@ class PDFProcessor:
         self.embeddings = None
         self.classifier = DocumentClassifier()
         self.partition_manager = None
-        
-        # Text splitter configuration
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", "。", "！", "？", ".", " ", ""],
-            length_function=len,
-        )
+        self.embedding_cache = None
+        # Caps embedding requests in flight across all concurrent batches/uploads
+        self._embed_semaphore = asyncio.Semaphore(max(1, settings.openai_embed_max_in_flight))
         
         self._init_connections()
     
@@ -46,25 +71,25 @@ class PDFProcessor:
         try:
             # Initialize Milvus client
             if self.milvus_config.get("address"):
-                self.client = MilvusClient(
-                    uri=f"http://{self.milvus_config['address']}"
-                )
-                self.partition_manager = PartitionManager(self.client)
+                self.partition_manager = get_partition_manager(f"http://{self.milvus_config['address']}")
+                self.client = self.partition_manager.client
                 print("[PDFProcessor] Milvus connection initialized")
             else:
                 print("[PDFProcessor] Milvus address not configured")
                 
-            # Initialize OpenAI embeddings
-            # Prefer embeddings-specific credentials if provided
-            effective_api_key = settings.openai_embed_api_key or settings.openai_api_key
+            # Initialize OpenAI embeddings (shared client, see get_embeddings)
             effective_base_url = settings.openai_embed_base_url or settings.openai_base_url
-            if effective_api_key:
-                self.embeddings = OpenAIEmbeddings(
-                    openai_api_key=effective_api_key,
-                    base_url=effective_base_url,
-                    model=(settings.openai_embed_model or "text-embedding-3-small")
-                )
+            self.embeddings = get_embeddings("text-embedding-3-small")
+            if self.embeddings is not None:
                 print("[PDFProcessor] OpenAI embeddings initialized")
+                if settings.embedding_cache_path:
+                    try:
+                        self.embedding_cache = EmbeddingCache(
+                            settings.embedding_cache_path,
+                            settings.openai_embed_dim or 1536
+                        )
+                    except Exception as e:
+                        print(f"[PDFProcessor] Embedding cache disabled: {e}")
                 try:
                     print(f"[PDFProcessor] Embeddings config -> base_url: {effective_base_url}, model: {settings.openai_embed_model or 'text-embedding-3-small'}")
                 except Exception:
@@ -101,6 +126,11 @@ class PDFProcessor:
                 "filename": filename
             }
         
+        # One insert task per embedding batch, with the batch's row count
+        insert_tasks: List[asyncio.Task] = []
+        batch_sizes: List[int] = []
+        # Chunks whose embedding failed (filled in by _generate_embeddings)
+        embedding_failed: List[int] = []
         try:
             # Ensure collection and partitions exist
             await self.partition_manager.ensure_collection_and_partitions()
@@ -123,29 +153,38 @@ class PDFProcessor:
                     "filename": filename
                 }
             
-            # Step 3: Generate embeddings
-            vectors_data = await self._generate_embeddings(chunks, classification, filename, user_id)
-            if not vectors_data:
-                return {
-                    "success": False,
-                    "error": "Failed to generate embeddings",
-                    "filename": filename
-                }
-            
-            # Step 4: Store in appropriate partition
+            # Steps 3+4: Generate embeddings and store in the appropriate partition.
+            # Each embedding batch is inserted as soon as it is ready, so Milvus
+            # inserts overlap with the embedding requests still in flight.
             partition_name = classification["partition_name"]
-            storage_success = await self.partition_manager.insert_document(
-                partition_name=partition_name,
-                document_data=vectors_data
-            )
+            async for vectors, texts, metadatas in self._generate_embeddings(chunks, classification, filename, user_id, embedding_failed):
+                batch_sizes.append(len(texts))
+                insert_tasks.append(asyncio.create_task(self.partition_manager.insert_document(
+                    partition_name=partition_name,
+                    vectors=vectors,
+                    texts=texts,
+                    metadatas=metadatas
+                )))
             
-            if not storage_success:
+            if not insert_tasks:
                 return {
                     "success": False,
-                    "error": "Failed to store document in Milvus",
+                    "error": "Failed to generate embeddings",
                     "filename": filename
                 }
             
+            await asyncio.gather(*insert_tasks, return_exceptions=True)
+            vectors_stored = _rows_stored(insert_tasks, batch_sizes)
+            if vectors_stored < sum(batch_sizes):
+                return self._storage_failure(
+                    filename, "Failed to store document in Milvus", insert_tasks, batch_sizes, len(embedding_failed)
+                )
+            if embedding_failed:
+                return self._storage_failure(
+                    filename, f"Failed to embed {len(embedding_failed)} of {len(chunks)} chunks",
+                    insert_tasks, batch_sizes, len(embedding_failed)
+                )
+            
             # Return success result
             return {
                 "success": True,
@@ -155,7 +194,7 @@ class PDFProcessor:
                 "partition_name": partition_name,
                 "confidence": classification["confidence"],
                 "chunks_processed": len(chunks),
-                "vectors_stored": len(vectors_data),
+                "vectors_stored": vectors_stored,
                 "summary": classification.get("summary", ""),
                 "processing_method": classification.get("method", "unknown"),
                 "timestamp": datetime.now().isoformat()
@@ -163,11 +202,45 @@ class PDFProcessor:
             
         except Exception as e:
             print(f"[PDFProcessor] Processing error: {e}")
+            if insert_tasks:
+                # Batches already handed to Milvus finish regardless (the insert
+                # runs in a thread), so wait for them and report what was stored
+                await asyncio.gather(*insert_tasks, return_exceptions=True)
+                return self._storage_failure(filename, str(e), insert_tasks, batch_sizes, len(embedding_failed))
             return {
                 "success": False,
                 "error": str(e),
                 "filename": filename
             }
+        
+        finally:
+            # Only reached with pending inserts when this upload was cancelled
+            pending = [task for task in insert_tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    @staticmethod
+    def _storage_failure(filename: str,
+                         error: str,
+                         insert_tasks: List[asyncio.Task],
+                         batch_sizes: List[int],
+                         embedding_failed: int = 0) -> Dict[str, Any]:
+        """
+        Failure result for an upload whose chunks were not all embedded and
+        stored. Stored batches are kept (the filename filter delete removes them)
+        and reported with partial=True so the caller can retry or delete the file.
+        """
+        vectors_stored = _rows_stored(insert_tasks, batch_sizes)
+        return {
+            "success": False,
+            "error": error,
+            "filename": filename,
+            "partial": vectors_stored > 0,
+            "vectors_stored": vectors_stored,
+            "vectors_failed": sum(batch_sizes) - vectors_stored + embedding_failed
+        }
     
     async def process_pdf_content(self, 
                                  file_content: bytes,
@@ -185,10 +258,9 @@ class PDFProcessor:
         Returns:
             Processing result
         """
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(file_content)
-            tmp_file_path = tmp_file.name
+        # Write the temporary file off the event loop (uploads can be tens of MB);
+        # the parser worker process reads it by path
+        tmp_file_path = await asyncio.to_thread(_write_tempfile, file_content)
         
         try:
             # Process the temporary file
@@ -203,27 +275,23 @@ class PDFProcessor:
                 pass
     
     async def _extract_and_chunk_pdf(self, file_path: str, filename: str) -> List[Dict[str, Any]]:
-        """Extract text from PDF and split into chunks."""
+        """Extract text from PDF and split into chunks (parsed in a worker process)."""
         try:
-            # Load PDF
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
+            loop = asyncio.get_running_loop()
+            pieces = await loop.run_in_executor(_get_pdf_pool(), _parse_and_split, file_path)
             
-            if not documents:
+            if not pieces:
                 print(f"[PDFProcessor] No content extracted from {filename}")
                 return []
             
-            # Split documents into chunks
-            split_docs = self.text_splitter.split_documents(documents)
-            
             # Convert to our format
             chunks = []
-            for i, doc in enumerate(split_docs):
+            for i, (page, text) in enumerate(pieces):
                 chunks.append({
-                    "text": doc.page_content,
+                    "text": text,
                     "metadata": {
                         "filename": filename,
-                        "page": doc.metadata.get("page", 0),
+                        "page": page,
                         "chunk_index": i,
                         "source": file_path
                     }
@@ -240,62 +308,193 @@ class PDFProcessor:
                                   chunks: List[Dict[str, Any]], 
                                   classification: Dict[str, Any],
                                   filename: str,
-                                  user_id: Optional[str]) -> List[Dict[str, Any]]:
-        """Generate embeddings for text chunks."""
+                                  user_id: Optional[str],
+                                  failed: List[int]) -> AsyncIterator[Tuple[np.ndarray, List[str], List[Dict[str, Any]]]]:
+        """
+        Generate embeddings for text chunks.
+        
+        Chunks are embedded in batches of openai_embed_batch_size (cut from the
+        chunks sorted by length) that run concurrently; columns (vectors of shape
+        (n, dim), texts, metadatas) are yielded per batch as soon as it completes.
+        Near-duplicate chunks (see _near_duplicates) are not embedded themselves
+        but reuse the vector of the chunk they resemble. Chunks that could not be
+        embedded are left out and their indices appended to failed.
+        """
+        batch_size = max(1, settings.openai_embed_batch_size)
+        
+        # Repeated headers/footers/boilerplate: embed the first occurrence only
+        canonical = await asyncio.to_thread(_near_duplicates, [chunk["text"] for chunk in chunks])
+        duplicates: Dict[int, List[int]] = {}
+        for i, first in enumerate(canonical):
+            if i != first:
+                duplicates.setdefault(first, []).append(i)
+        if duplicates:
+            print(f"[PDFProcessor] Reusing embeddings for {len(chunks) - len(set(canonical))} near-duplicate chunks of {filename}")
+        order = sorted(set(canonical), key=lambda i: len(chunks[i]["text"]))
+        
+        # Same for every chunk of this upload: compute once, outside the loop
+        now = datetime.now()
+        now_iso = now.isoformat()
+        now_ts = int(now.timestamp())
+        category = classification["category"]
+        category_name = classification["category_name"]
+        confidence = classification["confidence"]
+        method = classification.get("method", "unknown")
+        summary = classification.get("summary", "")[:200]  # Truncate summary
+        owner = user_id or ""
+        
+        # One contiguous (N, dim) matrix for the whole upload; each completed batch
+        # fills the next rows and is yielded as a slice (a view, no re-boxing)
+        matrix = np.empty((len(chunks), settings.openai_embed_dim or 1536), dtype=np.float32)
+        filled = 0
+        
+        async def _embed(group: List[int]) -> Tuple[List[int], List[Optional[List[float]]]]:
+            try:
+                return group, await self._generate_batch_embeddings([chunks[i]["text"] for i in group])
+            except Exception as e:
+                # Keep the group with the failure, so its chunks can be counted
+                logger.warning("Embedding batch failed for %s: %s", filename, e)
+                return group, [None] * len(group)
+        
+        tasks = [
+            asyncio.create_task(_embed(order[start:start + batch_size]))
+            for start in range(0, len(order), batch_size)
+        ]
+        generated = 0
         try:
-            vectors_data = []
-            
-            for i, chunk in enumerate(chunks):
-                # Generate embedding
-                vector = await self._generate_single_embedding(chunk["text"])
+            for next_done in asyncio.as_completed(tasks):
+                group, group_vectors = await next_done
                 
-                if vector is None:
-                    print(f"[PDFProcessor] Failed to generate embedding for chunk {i}")
-                    continue
-                
-                # Create document record
-                doc_id = f"{filename}_{i}_{classification['category']}_{int(datetime.now().timestamp())}"
-                
-                # Enhanced metadata
-                metadata = chunk["metadata"].copy()
-                metadata.update({
-                    "category": classification["category"],
-                    "category_name": classification["category_name"],
-                    "confidence": classification["confidence"],
-                    "processing_method": classification.get("method", "unknown"),
-                    "upload_time": datetime.now().isoformat(),
-                    "document_summary": classification.get("summary", "")[:200],  # Truncate summary
-                    "doc_id": doc_id,
-                    "user_id": user_id or "",
-                })
+                start = filled
+                texts = []
+                metadatas = []
+                for i, vector in zip(group, group_vectors):
+                    if vector is None:
+                        # The chunk and every near-duplicate that would reuse its vector
+                        failed.append(i)
+                        failed.extend(duplicates.get(i, ()))
+                        continue
+                    
+                    # The chunk itself, then its near-duplicates with the same vector
+                    for k in (i, *duplicates.get(i, ())):
+                        chunk = chunks[k]
+                        # Create document record
+                        doc_id = f"{filename}_{k}_{category}_{now_ts}"
+                        
+                        # Enhanced metadata
+                        metadata = chunk["metadata"].copy()
+                        metadata.update({
+                            "category": category,
+                            "category_name": category_name,
+                            "confidence": confidence,
+                            "processing_method": method,
+                            "upload_time": now_iso,
+                            "upload_ts": now_ts,
+                            "document_summary": summary,
+                            "doc_id": doc_id,
+                            "user_id": owner,
+                        })
+                        
+                        # do not set explicit id; let Milvus auto_id generate it
+                        matrix[filled] = vector
+                        filled += 1
+                        texts.append(chunk["text"])
+                        metadatas.append(metadata)
                 
-                vectors_data.append({
-                    # do not set explicit id; let Milvus auto_id generate it
-                    "vector": vector,
-                    "text": chunk["text"],
-                    "metadata": metadata
-                })
-            
-            print(f"[PDFProcessor] Generated {len(vectors_data)} embeddings for {filename}")
-            return vectors_data
-            
+                if texts:
+                    generated += len(texts)
+                    yield matrix[start:filled], texts, metadatas
+        finally:
+            # Consumer stopped early (or failed): do not leave requests running
+            for task in tasks:
+                task.cancel()
+        
+        print(f"[PDFProcessor] Generated {generated} embeddings for {filename}")
+        if failed:
+            logger.warning("Failed to embed %d chunks of %s", len(failed), filename)
+    
+    async def _generate_batch_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed texts, reading previously embedded ones from the persistent cache
+        (when configured) and embedding only the misses.
+        """
+        if self.embedding_cache is None or not texts:
+            return await self._embed_uncached(texts)
+        
+        model = settings.openai_embed_model or "text-embedding-3-small"
+        keys = [EmbeddingCache.key(model, text) for text in texts]
+        try:
+            cached = await asyncio.to_thread(self.embedding_cache.get_many, keys)
         except Exception as e:
-            print(f"[PDFProcessor] Embedding generation error: {e}")
+            print(f"[PDFProcessor] Embedding cache read error: {e}")
+            cached = {}
+        
+        out: List[Optional[List[float]]] = [cached.get(key) for key in keys]
+        misses = [i for i, vector in enumerate(out) if vector is None]
+        if not misses:
+            return out
+        
+        fresh = await self._embed_uncached([texts[i] for i in misses])
+        for i, vector in zip(misses, fresh):
+            out[i] = vector
+        try:
+            await asyncio.to_thread(
+                self.embedding_cache.put_many,
+                model,
+                [(keys[i], vector) for i, vector in zip(misses, fresh) if vector is not None]
+            )
+        except Exception as e:
+            print(f"[PDFProcessor] Embedding cache write error: {e}")
+        return out
+    
+    async def _embed_uncached(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed all texts in sub-batches of openai_embed_batch_size, with up to
+        openai_embed_max_in_flight requests running concurrently. Batches are cut
+        from the texts sorted by length, so each request holds similar-sized
+        inputs and concurrent requests finish at similar times; results are
+        scattered back to the input order. A sub-batch that fails falls back to per-text
+        embedding, so one bad input does not drop the whole document.
+        """
+        if not texts:
             return []
+        
+        batch_size = max(1, settings.openai_embed_batch_size)
+        expected_dim = settings.openai_embed_dim or 1536
+        
+        async def _embed_batch(batch: List[str]) -> List[Optional[List[float]]]:
+            try:
+                async with self._embed_semaphore:
+                    vectors = await self.embeddings.aembed_documents(batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+                if len(vectors[0]) != expected_dim:
+                    raise ValueError(f"Expected {expected_dim} dimensions, got {len(vectors[0])}")
+                return vectors
+            except Exception as e:
+                print(f"[PDFProcessor] Batch embedding error, falling back to per-chunk: {e}")
+                return [await self._generate_single_embedding(text) for text in batch]
+        
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = await asyncio.gather(*(
+            _embed_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(order), batch_size)
+        ))
+        
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        for idx, vector in zip(order, (vector for batch in batches for vector in batch)):
+            out[idx] = vector
+        return out
     
     async def _generate_single_embedding(self, text: str) -> Optional[List[float]]:
         """Generate embedding for a single text chunk."""
         try:
-            def _embed():
-                vector = self.embeddings.embed_query(text)
-                expected_dim = settings.openai_embed_dim or 1536
-                if len(vector) != expected_dim:
-                    raise ValueError(f"Expected {expected_dim} dimensions, got {len(vector)}")
-                return vector
-            
-            # Run in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            vector = await loop.run_in_executor(None, _embed)
+            # Native async request, no executor thread
+            async with self._embed_semaphore:
+                vector = await self.embeddings.aembed_query(text)
+            expected_dim = settings.openai_embed_dim or 1536
+            if len(vector) != expected_dim:
+                raise ValueError(f"Expected {expected_dim} dimensions, got {len(vector)}")
             return vector
             
         except Exception as e:
@@ -381,28 +580,56 @@ class PDFProcessor:
             return {"success": False, "error": "Partition manager not initialized"}
         
         try:
+            pm = self.partition_manager
+            collection_name = settings.documents_collection_name or "documents"
             deleted_count = 0
+            failed = False
+            
+            def _count(result) -> int:
+                # MilvusClient returns {"delete_count": n}; older clients a result object
+                if isinstance(result, dict):
+                    return int(result.get("delete_count", 0) or 0)
+                return int(getattr(result, "delete_count", 0) or 0)
             
-            # Search across all partitions for documents with this filename
-            for partition in self.partition_manager.partitions:
+            # Ids this process inserted go first (no scan). They never cover chunks
+            # from earlier runs or other workers, so the filter delete below
+            # always runs over every partition as well.
+            ids_by_partition = pm.ids_for_filename(filename, user_id) or {}
+            for partition, ids in ids_by_partition.items():
                 try:
-                    # Delete documents matching the filename
-                    expr = f'metadata["filename"] == "{filename}"'
-                    if user_id:
-                        expr = expr + f' and metadata["user_id"] == "{user_id}"'
-                    result = self.client.delete(
-                        collection_name=settings.documents_collection_name or "documents",
-                        expr=expr,
-                        partition_names=[partition]
+                    result = await pm._run(
+                        self.client.delete,
+                        collection_name=collection_name,
+                        ids=ids,
+                        partition_name=partition
                     )
-                    
-                    if hasattr(result, 'delete_count'):
-                        deleted_count += result.delete_count
-                        
+                    deleted_count += _count(result)
                 except Exception as e:
+                    print(f"[PDFProcessor] Error deleting ids from {partition}: {e}")
+            
+            field = pm.field_expr
+            expr = f'{field("filename")} == {expr_literal(filename)}'
+            if user_id:
+                expr = expr + f' and {field("user_id")} == {expr_literal(user_id)}'
+            
+            for partition in pm.partitions:
+                try:
+                    result = await pm._run(
+                        self.client.delete,
+                        collection_name=collection_name,
+                        filter=expr,
+                        partition_name=partition
+                    )
+                    deleted_count += _count(result)
+                except Exception as e:
+                    failed = True
                     print(f"[PDFProcessor] Error deleting from {partition}: {e}")
                     continue
             
+            if not failed:
+                # The recorded ids are gone now; a later re-upload records new ones
+                pm.forget_filename(filename)
+            
             return {
                 "success": deleted_count > 0,
                 "filename": filename,
@@ -417,3 +644,61 @@ class PDFProcessor:
                 "filename": filename,
                 "error": str(e)
             }
+
+
+def _rows_stored(insert_tasks: List[asyncio.Task], batch_sizes: List[int]) -> int:
+    """Rows of the insert batches that finished successfully."""
+    return sum(
+        size for task, size in zip(insert_tasks, batch_sizes)
+        if task.done() and not task.cancelled() and task.exception() is None and task.result()
+    )
+
+
+def _write_tempfile(content: bytes) -> str:
+    """Write PDF bytes to a temp file and return its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(content)
+        return tmp_file.name
+
+
+def _simhash(text: str) -> int:
+    """64-bit SimHash over the distinct character 3-grams of the normalized text."""
+    text = " ".join(text.lower().split())
+    shingles = {text[i:i + 3] for i in range(max(1, len(text) - 2))}
+    # hash() is salted per process, which is fine: signatures are only compared
+    # within one upload
+    hashes = np.fromiter((hash(s) for s in shingles), dtype=np.int64, count=len(shingles))
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+def _near_duplicates(texts: List[str]) -> List[int]:
+    """
+    For each text, the index of the first earlier text whose SimHash is within
+    _NEAR_DUP_BITS bits of its own (itself if none). Candidates come from four
+    16-bit bands looked up exactly: signatures that differ in at most 3 bits
+    share at least one band, so no pairwise scan is needed.
+    """
+    canonical = list(range(len(texts)))
+    signatures: List[int] = []
+    bands: List[Dict[int, List[int]]] = [{} for _ in range(4)]
+    for i, text in enumerate(texts):
+        signature = _simhash(text)
+        signatures.append(signature)
+        keys = [(signature >> (16 * b)) & 0xFFFF for b in range(4)]
+        match = next(
+            (
+                j
+                for band, key in zip(bands, keys)
+                for j in band.get(key, ())
+                if (signature ^ signatures[j]).bit_count() <= _NEAR_DUP_BITS
+            ),
+            None,
+        )
+        if match is not None:
+            canonical[i] = match
+            continue
+        for band, key in zip(bands, keys):
+            band.setdefault(key, []).append(i)
+    return canonical
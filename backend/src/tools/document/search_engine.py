@@ -3,15 +3,112 @@ Document search engine with cross-partition capabilities.
 Provides intelligent search across document categories with flexible filtering.
 """
 import asyncio
-from typing import List, Dict, Any, Optional
-from langchain_openai import OpenAIEmbeddings
-from pymilvus import MilvusClient
+import hashlib
+import heapq
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Sequence, Set, Tuple
+import numpy as np
 
-from .partition_manager import PartitionManager
+from .partition_manager import expr_literal, get_partition_manager
+from .processor import get_embeddings
+from .semantic_cache import SemanticCache
 from .classifier import DOCUMENT_CATEGORIES
 from ...core.config import get_milvus_config, settings
 
 
+# Query embeddings are deterministic per (model, text): keep recent ones locally
+_QUERY_EMBED_CACHE_SIZE = 2048
+_QUERY_EMBED_TTL_S = 3600.0
+
+# search_documents responses reused for queries this similar (cosine) within a scope.
+# Per process: invalidation only clears this worker's cache, so entries live no
+# longer than document_tools' 60s search cache
+_semantic_cache = SemanticCache(threshold=0.97, ttl_s=60.0, max_scopes=1024, max_per_scope=32)
+
+
+def invalidate_semantic_cache() -> None:
+    """Drop cached search responses; call after documents are added or removed."""
+    _semantic_cache.clear()
+
+
+@lru_cache(maxsize=1024)
+def _eq_filter(operand: str, value: str) -> str:
+    """`operand == value` with value escaped by expr_literal; cached, as the same users search repeatedly."""
+    return f"{operand} == {expr_literal(value)}"
+
+
+@lru_cache(maxsize=256)
+def _category_partitions(categories: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Partitions of the known categories, in request order."""
+    return tuple(
+        DOCUMENT_CATEGORIES[category]["partition"]
+        for category in categories
+        if category in DOCUMENT_CATEGORIES
+    )
+
+
+def _dedup_key(result: Dict[str, Any], meta: Dict[str, Any]) -> int:
+    """64-bit hash of a result's id, filename, page and text prefix (set of ints, not tuples)."""
+    text = result.get("text")
+    raw = f"{result.get('id') or ''}|{meta.get('filename', '')}|{meta.get('page', '')}|{text[:100] if isinstance(text, str) else ''}"
+    return int.from_bytes(hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _EmbedBatcher:
+    """
+    Coalesces query embeddings requested within flush_interval_s of each other
+    into one embed_documents call (at most max_batch texts); every caller awaits
+    its own future. One request per burst instead of one per concurrent search.
+    """
+    
+    def __init__(self, embeddings, flush_interval_s: float = 0.005, max_batch: int = 64):
+        self.embeddings = embeddings
+        self.flush_interval_s = flush_interval_s
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Running flushes (referenced so they are not garbage-collected mid-request)
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_interval_s, self._flush)
+        return await future
+    
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._embed(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _embed(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            # Native async request on the client's httpx pool: no executor thread
+            vectors = await self.embeddings.aembed_documents([text for text, _ in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            # Callers that gave up (cancelled) are skipped
+            if not future.done():
+                future.set_result(vector)
+
+
 class DocumentSearchEngine:
     """
     Advanced document search engine supporting:
@@ -27,6 +124,11 @@ class DocumentSearchEngine:
         self.embeddings = None
         self.partition_manager = None
         self.categories = DOCUMENT_CATEGORIES
+        # blake2b(model:query) -> (expires_at, vector), LRU order
+        self._embed_cache: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._embed_cache_hits = 0
+        self._embed_cache_misses = 0
+        self._batcher: Optional[_EmbedBatcher] = None
         
         self._init_connections()
     
@@ -35,21 +137,13 @@ class DocumentSearchEngine:
         try:
             # Initialize Milvus client
             if self.milvus_config.get("address"):
-                self.client = MilvusClient(
-                    uri=f"http://{self.milvus_config['address']}"
-                )
-                self.partition_manager = PartitionManager(self.client)
+                self.partition_manager = get_partition_manager(f"http://{self.milvus_config['address']}")
+                self.client = self.partition_manager.client
             
-            # Initialize OpenAI embeddings
-            # Prefer embeddings-specific credentials if provided
-            effective_api_key = settings.openai_embed_api_key or settings.openai_api_key
-            effective_base_url = settings.openai_embed_base_url or settings.openai_base_url
-            if effective_api_key:
-                self.embeddings = OpenAIEmbeddings(
-                    openai_api_key=effective_api_key,
-                    base_url=effective_base_url,
-                    model=(settings.openai_embed_model or "text-embedding-ada-002")
-                )
+            # Initialize OpenAI embeddings (shared with PDFProcessor)
+            self.embeddings = get_embeddings("text-embedding-ada-002")
+            if self.embeddings is not None:
+                self._batcher = _EmbedBatcher(self.embeddings)
                 
         except Exception as e:
             print(f"[DocumentSearchEngine] Initialization error: {e}")
@@ -106,6 +200,13 @@ class DocumentSearchEngine:
                     "results": []
                 }
             
+            # A near-identical query in the same scope: reuse its response
+            scope = (str(user_id), tuple(sorted(categories or ())), filename, limit, min_score)
+            cached = _semantic_cache.get(query_vector, scope)
+            if cached is not None:
+                cached["query"] = query
+                return cached
+            
             # Determine target partitions
             target_partitions = self._get_target_partitions(categories)
             if not target_partitions:
@@ -120,8 +221,7 @@ class DocumentSearchEngine:
             # 2) Public search without expr, restricted to public partitions
             #    Then merge locally with null-compatible visibility
 
-            private_expr = f'$meta["metadata"]["user_id"] == "{user_id}"'
-            public_partitions = list(self.partition_manager.partitions)
+            public_partitions = self.partition_manager.partitions_snapshot
 
             # TRACE：打印检索摘要（不打印向量内容）
             # (trace_events 调试日志已精简)
@@ -133,22 +233,37 @@ class DocumentSearchEngine:
                 except Exception:
                     pass
 
-            # Fire two searches in parallel
-            private_coro = self.partition_manager.search_partitions(
-                query_vector=query_vector,
-                partitions=target_partitions,
-                limit=limit * 2,
-                filter_expr=private_expr,
-            )
-            public_coro = self.partition_manager.search_partitions(
-                query_vector=query_vector,
-                partitions=public_partitions,
-                limit=limit * 3,
-                filter_expr=None,
-            )
+            # Column or metadata JSON path, whichever the collection supports
+            private_expr = _eq_filter(self.partition_manager.field_expr("user_id"), str(user_id))
 
-            raw_private, raw_public = await asyncio.gather(private_coro, public_coro)
-            raw_results = (raw_private or []) + (raw_public or [])
+            if self.partition_manager.has_scalar_columns:
+                # Every row has a user_id column (never null), so the rows this user
+                # may see are exactly the private_expr matches: one search over the
+                # union of both partition sets replaces the private + public pair
+                raw_results = await self.partition_manager.search_partitions(
+                    query_vector=query_vector,
+                    partitions=list(dict.fromkeys((*target_partitions, *public_partitions))),
+                    limit=limit * 3,
+                    filter_expr=private_expr,
+                )
+            else:
+                # Metadata JSON only: null user_id (public) rows cannot be matched
+                # reliably in one expression, so fire two searches in parallel
+                private_coro = self.partition_manager.search_partitions(
+                    query_vector=query_vector,
+                    partitions=target_partitions,
+                    limit=limit * 2,
+                    filter_expr=private_expr,
+                )
+                public_coro = self.partition_manager.search_partitions(
+                    query_vector=query_vector,
+                    partitions=public_partitions,
+                    limit=limit * 3,
+                    filter_expr=None,
+                )
+
+                raw_private, raw_public = await asyncio.gather(private_coro, public_coro)
+                raw_results = (raw_private or []) + (raw_public or [])
             
             # Process and rank results
             processed_results = self._process_and_rank_results(
@@ -166,19 +281,14 @@ class DocumentSearchEngine:
                     uid = meta.get("user_id")
                     if uid is not None and str(uid) != str(user_id):
                         continue
-                    # Deduplicate by id if present, else by (filename,page,text-hash)
-                    key = r.get("id") or (
-                        meta.get("filename"),
-                        meta.get("page"),
-                        (r.get("text", "")[:100] if isinstance(r.get("text"), str) else "")
-                    )
+                    # Deduplicate on a hash of id, filename, page and text prefix
+                    key = _dedup_key(r, meta)
                     if key in seen:
                         continue
                     seen.add(key)
                     filtered.append(r)
-                # Re-rank and cut to limit
-                filtered.sort(key=lambda x: x.get("score", 0.0), reverse=True)
-                processed_results = filtered[:limit]
+                # Re-rank and cut to limit (top-k only, no full sort)
+                processed_results = heapq.nlargest(limit, filtered, key=lambda x: x.get("score", 0.0))
 
             # Local post-filter by filename for stability/compatibility
             if filename:
@@ -192,7 +302,7 @@ class DocumentSearchEngine:
             # Compile search statistics
             stats = self._compile_search_stats(processed_results, target_partitions, query)
             
-            return {
+            response = {
                 "success": True,
                 "query": query,
                 "results": processed_results,
@@ -200,6 +310,8 @@ class DocumentSearchEngine:
                 "searched_partitions": target_partitions,
                 "statistics": stats
             }
+            _semantic_cache.put(query_vector, scope, response)
+            return response
             
         except Exception as e:
             print(f"[DocumentSearchEngine] Search error: {e}")
@@ -264,8 +376,8 @@ class DocumentSearchEngine:
             return {"success": True, "results": [], "total_found": 0, "reference_text": reference_text[:200] if isinstance(reference_text, str) else "", "statistics": {"reason": "missing_user_context"}}
         # Build exclusion filter
         filter_expr = None
-        if exclude_filename:
-            filter_expr = f'metadata["filename"] != "{exclude_filename}"'
+        if exclude_filename and self.partition_manager:
+            filter_expr = f'{self.partition_manager.field_expr("filename")} != {expr_literal(exclude_filename)}'
         
         try:
             query_vector = await self._generate_query_embedding(reference_text)
@@ -356,17 +468,23 @@ class DocumentSearchEngine:
             }
     
     async def _generate_query_embedding(self, query: str) -> Optional[List[float]]:
-        """Generate embedding for search query."""
+        """Generate embedding for search query (served from the local cache when seen recently)."""
+        model = settings.openai_embed_model or "text-embedding-ada-002"
+        key = hashlib.blake2b(f"{model}:{query}".encode("utf-8"), digest_size=16).hexdigest()
+        cached = self._embed_cache_get(key)
+        if cached is not None:
+            self._embed_cache_hits += 1
+            return cached
+        self._embed_cache_misses += 1
+        
         try:
-            def _embed():
-                vector = self.embeddings.embed_query(query)
-                expected_dim = settings.openai_embed_dim or 1536
-                if len(vector) != expected_dim:
-                    raise ValueError(f"Expected {expected_dim} dimensions, got {len(vector)}")
-                return vector
-            
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, _embed)
+            # Batched with concurrent queries into one embeddings request
+            vector = await self._batcher.submit(query)
+            expected_dim = settings.openai_embed_dim or 1536
+            if len(vector) != expected_dim:
+                raise ValueError(f"Expected {expected_dim} dimensions, got {len(vector)}")
+            self._embed_cache_put(key, vector)
+            return vector
             
         except Exception as e:
             try:
@@ -377,26 +495,36 @@ class DocumentSearchEngine:
                 pass
             return None
     
-    def _get_target_partitions(self, categories: Optional[List[str]]) -> List[str]:
-        """Determine which partitions to search based on categories."""
+    def _embed_cache_get(self, key: str) -> Optional[List[float]]:
+        entry = self._embed_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._embed_cache[key]
+            return None
+        self._embed_cache.move_to_end(key)
+        return entry[1]
+    
+    def _embed_cache_put(self, key: str, vector: List[float]) -> None:
+        self._embed_cache[key] = (time.monotonic() + _QUERY_EMBED_TTL_S, vector)
+        self._embed_cache.move_to_end(key)
+        if len(self._embed_cache) > _QUERY_EMBED_CACHE_SIZE:
+            self._embed_cache.popitem(last=False)
+    
+    def _get_target_partitions(self, categories: Optional[List[str]]) -> Tuple[str, ...]:
+        """Determine which partitions to search based on categories (shared tuples, no copies)."""
         if not categories:
             # Search all partitions
-            return list(self.partition_manager.partitions)
+            return self.partition_manager.partitions_snapshot
         
-        target_partitions = []
-        for category in categories:
-            if category in self.categories:
-                partition_name = self.categories[category]["partition"]
-                target_partitions.append(partition_name)
-        
-        return target_partitions
+        return _category_partitions(tuple(categories))
     
     def _build_filter_expression(self, filename: Optional[str]) -> Optional[str]:
         """Build Milvus filter expression."""
         filters = []
         
         if filename:
-            filters.append(f"meta['filename'] == \"{filename}\"")
+            filters.append(_eq_filter(self.partition_manager.field_expr("filename"), filename))
         
         return " AND ".join(filters) if filters else None
     
@@ -405,8 +533,15 @@ class DocumentSearchEngine:
                                 query: str,
                                 min_score: float,
                                 limit: int) -> List[Dict[str, Any]]:
-        """Process and rank search results."""
-        processed_results = []
+        """
+        Process and rank search results.
+        
+        Ranking works on a score column (kept hits + a float array): top-k is
+        picked with argpartition, and only the survivors are expanded into
+        result dicts.
+        """
+        kept: List[Dict[str, Any]] = []
+        scores = np.empty(len(raw_results), dtype=np.float64)
         
         for result in raw_results:
             # Apply score threshold
@@ -426,36 +561,46 @@ class DocumentSearchEngine:
             if effective_score < min_score:
                 continue
             
-            # Enhance result with additional info
-            enhanced_result = {
-                "id": result.get("id", ""),
-                "text": result.get("text", ""),
-                "score": effective_score,
-                "metadata": result.get("metadata", {}),
-                "category": result.get("metadata", {}).get("category", "unknown"),
-                "category_name": result.get("metadata", {}).get("category_name", "Unknown"),
-                "filename": result.get("metadata", {}).get("filename", ""),
-                "page": result.get("metadata", {}).get("page", 0),
-                "chunk_index": result.get("metadata", {}).get("chunk_index", 0),
-                "upload_time": result.get("metadata", {}).get("upload_time", ""),
-            }
-            
-            # Add snippet preview
-            text = enhanced_result["text"]
-            if len(text) > 300:
-                enhanced_result["snippet"] = text[:300] + "..."
-            else:
-                enhanced_result["snippet"] = text
-            
-            processed_results.append(enhanced_result)
+            scores[len(kept)] = effective_score
+            kept.append(result)
+        
+        if not kept or limit <= 0:
+            return []
+        scores = scores[:len(kept)]
+        
+        # Top results by score (highest first)
+        top = np.argpartition(-scores, limit)[:limit] if len(kept) > limit else np.arange(len(kept))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self._enhance_result(kept[i], float(scores[i])) for i in top]
+    
+    def _enhance_result(self, result: Dict[str, Any], score: float) -> Dict[str, Any]:
+        """Expand a raw hit into the response shape."""
+        metadata = result.get("metadata", {})
+        enhanced_result = {
+            "id": result.get("id", ""),
+            "text": result.get("text", ""),
+            "score": score,
+            "metadata": metadata,
+            "category": metadata.get("category", "unknown"),
+            "category_name": metadata.get("category_name", "Unknown"),
+            "filename": metadata.get("filename", ""),
+            "page": metadata.get("page", 0),
+            "chunk_index": metadata.get("chunk_index", 0),
+            "upload_time": metadata.get("upload_time", ""),
+        }
+        
+        # Add snippet preview
+        text = enhanced_result["text"]
+        if len(text) > 300:
+            enhanced_result["snippet"] = text[:300] + "..."
+        else:
+            enhanced_result["snippet"] = text
         
-        # Sort by score (highest first) and limit results
-        processed_results.sort(key=lambda x: x["score"], reverse=True)
-        return processed_results[:limit]
+        return enhanced_result
     
     def _compile_search_stats(self,
                             results: List[Dict[str, Any]],
-                            searched_partitions: List[str],
+                            searched_partitions: Sequence[str],
                             query: str) -> Dict[str, Any]:
         """Compile search statistics."""
         stats = {
@@ -494,7 +639,17 @@ class DocumentSearchEngine:
             "engine_status": "healthy" if self._check_prerequisites() else "degraded",
             "milvus_connected": self.client is not None,
             "embeddings_available": self.embeddings is not None,
-            "available_categories": list(self.categories.keys())
+            "available_categories": list(self.categories.keys()),
+            "query_embedding_cache": {
+                "size": len(self._embed_cache),
+                "hits": self._embed_cache_hits,
+                "misses": self._embed_cache_misses,
+            },
+            "semantic_cache": {
+                "size": len(_semantic_cache),
+                "hits": _semantic_cache.hits,
+                "misses": _semantic_cache.misses,
+            },
         }
         
         if self.partition_manager:
@@ -0,0 +1,81 @@
+"""
+In-process semantic cache for search responses.
+A lookup hits when an earlier query in the same scope embedded to a vector with
+cosine similarity >= threshold, so near-identical queries skip the Milvus searches.
+
+Each worker process has its own cache, and clear() only reaches the current one:
+there is no shared store (e.g. Redis) in this deployment. Other workers can serve
+results that predate an upload or delete until their entries expire, so keep
+ttl_s as short as the other search caches.
+"""
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Scope -> recent (query vector, response) entries. Scopes (user, categories,
+    filename, ...) never share entries, which keeps per-user isolation intact.
+    Not thread-safe; used from the event loop only.
+    """
+
+    def __init__(self, threshold: float, ttl_s: float, max_scopes: int, max_per_scope: int):
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_scopes = max_scopes
+        self.max_per_scope = max_per_scope
+        self.hits = 0
+        self.misses = 0
+        # scope -> [(expires_at, unit vector, response)], scopes in LRU order
+        self._scopes: "OrderedDict[Hashable, List[Tuple[float, np.ndarray, Dict[str, Any]]]]" = OrderedDict()
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    @staticmethod
+    def _copy(response: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy with its own results list (and result dicts); other values are shared."""
+        copied = dict(response)
+        if "results" in copied:
+            copied["results"] = copy.deepcopy(copied["results"])
+        return copied
+
+    def get(self, vector: Sequence[float], scope: Hashable) -> Optional[Dict[str, Any]]:
+        entries = self._scopes.get(scope)
+        if entries:
+            now = time.monotonic()
+            entries[:] = [entry for entry in entries if entry[0] >= now]
+        if not entries:
+            self._scopes.pop(scope, None)
+            self.misses += 1
+            return None
+
+        similarities = np.stack([entry[1] for entry in entries]) @ self._unit(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        self._scopes.move_to_end(scope)
+        self.hits += 1
+        return self._copy(entries[best][2])
+
+    def put(self, vector: Sequence[float], scope: Hashable, response: Dict[str, Any]) -> None:
+        entries = self._scopes.setdefault(scope, [])
+        # Stored as a copy, like get returns one: later edits by the caller don't reach the cache
+        entries.append((time.monotonic() + self.ttl_s, self._unit(vector), self._copy(response)))
+        del entries[:-self.max_per_scope]
+        self._scopes.move_to_end(scope)
+        if len(self._scopes) > self.max_scopes:
+            self._scopes.popitem(last=False)
+
+    def clear(self) -> None:
+        self._scopes.clear()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._scopes.values())
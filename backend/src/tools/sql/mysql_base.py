@@ -2,71 +2,149 @@
 MySQL base connection and query utilities
 """
 import asyncio
-import mysql.connector
-from typing import List, Dict, Any, Optional
-from mysql.connector import pooling
+import aiomysql
+from itertools import islice
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 from ...core.config import get_mysql_config
+from .builders import validate_field_name
+
+# Rows per executemany call; bounds memory when params come from a lazy iterable
+_EXECUTE_MANY_CHUNK = 1000
+# Keys per IN (...) list in select_in
+_SELECT_IN_CHUNK = 1000
+# Pool (re)connect: immediate attempt, then one retry after each delay; the error
+# propagates after the last retry and the next call starts a fresh sequence
+_CONNECT_BACKOFF_S = (0.1, 1.0, 5.0)
 
 
 class DatabaseManager:
-	"""Database connection manager"""
+	"""Database connection manager (native asyncio pool; queries await the socket directly)"""
 	
 	def __init__(self):
-		self.config = get_mysql_config()
-		self.pool = None
-		self._init_pool()
+		# Nothing is opened here; the pool is created by startup() or the first query
+		self.pool: Optional[aiomysql.Pool] = None
+		self._pool_lock = asyncio.Lock()
+	
+	async def connect(self) -> aiomysql.Pool:
+		"""Create the connection pool lazily (must run on the event loop)
+		
+		Concurrent callers serialize on a lock so a failing server sees one
+		reconnect sequence at a time, spaced by _CONNECT_BACKOFF_S.
+		"""
+		if self.pool is not None:
+			return self.pool
+		async with self._pool_lock:
+			if self.pool is not None:
+				return self.pool
+			config = get_mysql_config()
+			config["db"] = config.pop("database")  # aiomysql naming
+			last_error: Optional[Exception] = None
+			for delay in (0.0,) + _CONNECT_BACKOFF_S:
+				if delay:
+					await asyncio.sleep(delay)
+				try:
+					# charset is negotiated in the handshake: no separate SET NAMES round-trip.
+					# autocommit: reads must not leave a transaction open, or release()
+					# closes the connection instead of pooling it (and a reused one would
+					# keep reading its old REPEATABLE READ snapshot)
+					self.pool = await aiomysql.create_pool(
+						minsize=1, maxsize=20, charset="utf8mb4", autocommit=True, **config
+					)
+					return self.pool
+				except Exception as e:
+					last_error = e
+			raise last_error
 	
-	def _init_pool(self):
-		"""Initialize connection pool"""
-		try:
-			self.pool = mysql.connector.pooling.MySQLConnectionPool(
-				pool_name="business_pool",
-				pool_size=5,
-				**self.config
-			)
-		except Exception as e:
-			self.pool = None
+	async def startup(self) -> None:
+		"""Open the pool at application startup"""
+		await self.connect()
 	
-	def get_connection(self):
-		"""Get a connection from the pool"""
-		if not self.pool:
-			self._init_pool()
-		return self.pool.get_connection()
+	async def shutdown(self) -> None:
+		"""Close the pool at application shutdown"""
+		async with self._pool_lock:
+			if self.pool is not None:
+				self.pool.close()
+				await self.pool.wait_closed()
+				self.pool = None
+	
+	async def execute_query_rows(self, query: str, params: tuple = None) -> Tuple[List[str], List[tuple]]:
+		"""Execute a query and return (column names, tuple rows) for columnar consumers"""
+		pool = await self.connect()
+		async with pool.acquire() as conn:
+			async with conn.cursor() as cursor:
+				await cursor.execute(query, params or ())
+				rows = await cursor.fetchall()
+				columns = [d[0] for d in cursor.description or ()]
+				return columns, list(rows)
 	
 	async def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
 		"""Execute a query and return results"""
-		def _execute():
-			conn = self.get_connection()
-			try:
-				cursor = conn.cursor(dictionary=True)
-				cursor.execute(query, params or ())
-				results = cursor.fetchall()
-				cursor.close()
-				return results
-			finally:
-				conn.close()
+		# Tuple rows zipped with the column names once, instead of a dict cursor
+		columns, rows = await self.execute_query_rows(query, params)
+		return [dict(zip(columns, row)) for row in rows]
+	
+	async def select_in(
+		self, table: str, key_col: str, keys: List[Any], cols: List[str]
+	) -> Dict[Any, Dict[str, Any]]:
+		"""Fetch rows for many keys with one ``WHERE key IN (...)`` query per chunk
 		
-		# Run in thread pool to avoid blocking
-		loop = asyncio.get_event_loop()
-		return await loop.run_in_executor(None, _execute)
+		Preferred over looping ``execute_query("SELECT ... WHERE id=%s", (id,))``:
+		N round-trips become ceil(N / 1000). Returns rows keyed by ``key_col``,
+		which must come back under that exact name (a plain column, not a
+		qualified ``t.col`` or an expression), else ValueError.
+		"""
+		for name in (table, key_col, *cols):
+			if not validate_field_name(name):
+				raise ValueError(f"Invalid identifier: {name}")
+		select_cols = cols if key_col in cols else [key_col, *cols]
+		result: Dict[Any, Dict[str, Any]] = {}
+		unique_keys = list(dict.fromkeys(keys))
+		for i in range(0, len(unique_keys), _SELECT_IN_CHUNK):
+			chunk = unique_keys[i:i + _SELECT_IN_CHUNK]
+			placeholders = ", ".join(["%s"] * len(chunk))
+			query = f"SELECT {', '.join(select_cols)} FROM {table} WHERE {key_col} IN ({placeholders})"
+			columns, rows = await self.execute_query_rows(query, tuple(chunk))
+			if key_col not in columns:
+				raise ValueError(f"Key column {key_col} not in result columns {columns}")
+			key_index = columns.index(key_col)
+			for row in rows:
+				result[row[key_index]] = dict(zip(columns, row))
+		return result
 	
-	async def execute_many(self, query: str, params_list: List[tuple]) -> int:
-		"""Execute multiple queries"""
-		def _execute():
-			conn = self.get_connection()
-			try:
-				cursor = conn.cursor()
-				cursor.executemany(query, params_list)
-				conn.commit()
-				affected_rows = cursor.rowcount
-				cursor.close()
-				return affected_rows
-			finally:
-				conn.close()
+	async def execute_many(self, query: str, params_list: Iterable[tuple]) -> int:
+		"""Execute multiple queries
 		
-		loop = asyncio.get_event_loop()
-		return await loop.run_in_executor(None, _execute)
+		For ``INSERT ... VALUES (...)`` statements aiomysql's executemany already
+		folds the rows into multi-row ``VALUES (...),(...)`` statements (split at
+		max_stmt_length), so each chunk costs a few round-trips rather than one per
+		row; other statements fall back to per-row execution. Rows are consumed in
+		chunks so large or lazy inputs are never fully materialized.
+		"""
+		pool = await self.connect()
+		affected_rows = 0
+		rows = iter(params_list)
+		async with pool.acquire() as conn:
+			# The pool autocommits; keep all chunks in one explicit transaction
+			await conn.begin()
+			try:
+				async with conn.cursor() as cursor:
+					while True:
+						chunk = list(islice(rows, _EXECUTE_MANY_CHUNK))
+						if not chunk:
+							break
+						await cursor.executemany(query, chunk)
+						affected_rows += cursor.rowcount
+				await conn.commit()
+			except BaseException:
+				await conn.rollback()
+				raise
+		return affected_rows
+
+
+# Global database manager instance (cheap: no connections until startup/first query)
+db_manager = DatabaseManager()
 
 
-# Global database manager instance
-db_manager = DatabaseManager() 
\ No newline at end of file
+def get_db() -> DatabaseManager:
+	"""FastAPI dependency returning the shared database manager"""
+	return db_manager
@@ -0,0 +1,81 @@
+import pytest
+
+from src.tools.document import pdf_parsing
+from src.tools.document.pdf_parsing import _split_text
+
+_TEXT = (
+    "First paragraph talks about vectors. It has two sentences.\n\n"
+    "Second paragraph is about indexes and partitions in Milvus.\n"
+    "A new line continues it. Then a final sentence ends it.\n\n"
+    "Third paragraph closes the document with a short remark."
+)
+
+
+@pytest.fixture
+def char_chunks(monkeypatch):
+    monkeypatch.setattr(pdf_parsing, "_get_chunk_encoding", lambda: None)
+    monkeypatch.setattr(pdf_parsing, "_CHUNK_SIZE", 80)
+    monkeypatch.setattr(pdf_parsing, "_CHUNK_OVERLAP", 20)
+
+
+@pytest.fixture
+def token_chunks(monkeypatch):
+    pytest.importorskip("tiktoken")
+    monkeypatch.setattr(pdf_parsing.settings, "chunk_tokens", 20)
+    monkeypatch.setattr(pdf_parsing.settings, "chunk_overlap_tokens", 5)
+    pdf_parsing._get_chunk_encoding.cache_clear()
+    yield pdf_parsing._get_chunk_encoding()
+    pdf_parsing._get_chunk_encoding.cache_clear()
+
+
+def _assert_covers_in_order(text, chunks):
+    """Every chunk comes from text, chunks start in order and together cover all words."""
+    position = -1
+    for chunk in chunks:
+        found = text.find(chunk, position + 1)
+        assert found > position
+        position = found
+    assert set(text.split()) == {word for chunk in chunks for word in chunk.split()}
+
+
+def test_short_text_is_one_chunk(char_chunks):
+    assert _split_text("  short text  ") == ["short text"]
+    assert _split_text("   ") == []
+
+
+def test_char_chunks_respect_size_and_boundaries(char_chunks):
+    chunks = _split_text(_TEXT)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    _assert_covers_in_order(_TEXT, chunks)
+    # Cut at a boundary, never inside a word
+    for chunk in chunks[:-1]:
+        assert chunk[-1] in ".。！？" or f"{chunk} " in _TEXT or f"{chunk}\n" in _TEXT
+
+
+def test_char_chunks_overlap(char_chunks):
+    chunks = _split_text(_TEXT)
+    for previous, current in zip(chunks, chunks[1:]):
+        # The next window starts back inside the previous one
+        assert set(previous.split()) & set(current.split())
+
+
+def test_hard_cut_without_boundaries(char_chunks):
+    text = "x" * 200
+    chunks = _split_text(text)
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert chunks[0] == "x" * 80
+    # Consecutive windows overlap by the configured characters
+    assert sum(len(chunk) for chunk in chunks) - 20 * (len(chunks) - 1) == 200
+
+
+def test_token_chunks_respect_size_and_overlap(token_chunks):
+    encoding = token_chunks
+    assert encoding is not None
+    text = " ".join([_TEXT] * 3)
+    chunks = _split_text(text)
+    assert len(chunks) > 1
+    assert all(len(encoding.encode(chunk)) <= 20 for chunk in chunks)
+    _assert_covers_in_order(text, chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert set(previous.split()) & set(current.split())
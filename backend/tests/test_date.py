@@ -0,0 +1,55 @@
+import pytest
+
+from src.tools.date import DateCalculator, _DATE_OPS
+
+
+def _calc(base_date, *operations):
+    return DateCalculator.calculate_date_operations(
+        base_date, [{"type": op, "value": value} for op, value in operations]
+    )
+
+
+@pytest.mark.parametrize(
+    "base_date, op, value, expected",
+    [
+        ("2024-03-10", "add_days", 25, "2024-04-04"),
+        ("2024-03-01", "subtract_days", 1, "2024-02-29"),
+        ("2024-03-10", "add_weeks", 2, "2024-03-24"),
+        ("2024-03-10", "subtract_weeks", 1, "2024-03-03"),
+        ("2024-01-31", "add_months", 1, "2024-02-29"),
+        ("2023-01-31", "add_months", 1, "2023-02-28"),
+        ("2024-03-31", "subtract_months", 1, "2024-02-29"),
+        ("2024-02-29", "add_years", 1, "2025-02-28"),
+        ("2024-02-29", "subtract_years", 4, "2020-02-29"),
+        ("2024-02-10", "end_of_month", None, "2024-02-29"),
+        ("2024-02-10", "start_of_month", None, "2024-02-01"),
+        # 2024-03-13 is a Wednesday
+        ("2024-03-13", "next_weekday", "friday", "2024-03-15"),
+        ("2024-03-13", "next_weekday", "wed", "2024-03-20"),
+        ("2024-03-13", "previous_weekday", "Monday", "2024-03-11"),
+        ("2024-03-13", "previous_weekday", "wednesday", "2024-03-06"),
+    ],
+)
+def test_each_operation(base_date, op, value, expected):
+    assert _calc(base_date, (op, value)) == expected
+
+
+def test_every_operation_is_covered():
+    assert set(_DATE_OPS) == {
+        "add_days", "subtract_days", "add_weeks", "subtract_weeks",
+        "add_months", "subtract_months", "add_years", "subtract_years",
+        "end_of_month", "start_of_month", "next_weekday", "previous_weekday",
+    }
+
+
+def test_operations_apply_in_order():
+    assert _calc("2024-01-15", ("add_months", 1), ("end_of_month", None)) == "2024-02-29"
+    assert _calc("2024-01-31", ("end_of_month", None), ("add_months", 1)) == "2024-02-29"
+
+
+def test_op_type_is_case_insensitive_and_unknown_types_are_ignored():
+    assert _calc("2024-03-10", ("ADD_DAYS", 1), ("teleport", 3)) == "2024-03-11"
+
+
+def test_invalid_base_date_is_returned_unchanged():
+    assert _calc("not-a-date", ("add_days", 1)) == "not-a-date"
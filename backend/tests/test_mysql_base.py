@@ -0,0 +1,46 @@
+import pytest
+
+from src.tools.sql.mysql_base import DatabaseManager
+
+
+def _manager(result_columns, rows_by_call):
+    """DatabaseManager whose queries return canned (columns, rows) and are recorded."""
+    db = DatabaseManager()
+    calls = []
+
+    async def execute_query_rows(query, params=None):
+        calls.append((query, params))
+        return result_columns, rows_by_call[len(calls) - 1]
+
+    db.execute_query_rows = execute_query_rows
+    return db, calls
+
+
+async def test_select_in_keys_rows_by_key_column():
+    db, calls = _manager(["id", "name"], [[(1, "a"), (2, "b")]])
+    result = await db.select_in("users", "id", [1, 2, 1], ["name"])
+    assert result == {1: {"id": 1, "name": "a"}, 2: {"id": 2, "name": "b"}}
+    # Duplicate keys are sent once; the key column is added to the select list
+    assert calls == [("SELECT id, name FROM users WHERE id IN (%s, %s)", (1, 2))]
+
+
+async def test_select_in_chunks_large_key_lists(monkeypatch):
+    monkeypatch.setattr("src.tools.sql.mysql_base._SELECT_IN_CHUNK", 2)
+    db, calls = _manager(["id"], [[(1,), (2,)], [(3,)]])
+    result = await db.select_in("users", "id", [1, 2, 3], ["id"])
+    assert sorted(result) == [1, 2, 3]
+    assert [params for _, params in calls] == [(1, 2), (3,)]
+
+
+async def test_select_in_rejects_key_missing_from_result_columns():
+    # "u.id" comes back from MySQL as "id": keying on column 0 would be silent
+    db, _ = _manager(["name", "id"], [[("a", 1)]])
+    with pytest.raises(ValueError):
+        await db.select_in("users", "u.id", [1], ["name"])
+
+
+async def test_select_in_rejects_unsafe_identifiers():
+    db, calls = _manager(["id"], [[]])
+    with pytest.raises(ValueError):
+        await db.select_in("users; DROP TABLE users", "id", [1], ["id"])
+    assert calls == []
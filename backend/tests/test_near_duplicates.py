@@ -0,0 +1,88 @@
+import numpy as np
+
+from src.tools.document import processor
+from src.tools.document.processor import PDFProcessor, _near_duplicates, _simhash
+
+_BOILERPLATE = "Confidential - Internal use only. Page footer of the quarterly report."
+
+
+def test_simhash_ignores_case_and_whitespace():
+    assert _simhash(_BOILERPLATE) == _simhash("  " + _BOILERPLATE.upper().replace(" ", "\n  "))
+    assert _simhash(_BOILERPLATE) != _simhash("Milvus partitions group vectors by document category.")
+
+
+def test_near_duplicates_map_to_first_occurrence():
+    texts = [
+        _BOILERPLATE,
+        "Milvus partitions group vectors by document category.",
+        _BOILERPLATE.lower(),
+        "Embeddings are computed in concurrent batches of chunks.",
+        " ".join(_BOILERPLATE.split()) + "  ",
+    ]
+    assert _near_duplicates(texts) == [0, 1, 0, 3, 0]
+    assert _near_duplicates([]) == []
+
+
+async def test_generate_embeddings_reuses_vector_of_near_duplicate(monkeypatch):
+    monkeypatch.setattr(processor.settings, "openai_embed_batch_size", 8)
+    monkeypatch.setattr(processor.settings, "openai_embed_dim", 2)
+    engine = PDFProcessor.__new__(PDFProcessor)  # no Milvus/OpenAI connections
+    embedded = []
+
+    async def generate_batch_embeddings(texts):
+        embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    engine._generate_batch_embeddings = generate_batch_embeddings
+    chunks = [
+        {"text": _BOILERPLATE, "metadata": {}},
+        {"text": "Body text of the first page.", "metadata": {}},
+        {"text": _BOILERPLATE.upper(), "metadata": {}},
+    ]
+    classification = {"category": "report", "category_name": "Report", "confidence": 0.9}
+    failed = []
+    batches = [
+        (vectors.copy(), texts, metadatas)
+        async for vectors, texts, metadatas in engine._generate_embeddings(
+            chunks, classification, "report.pdf", "user-1", failed
+        )
+    ]
+
+    # The duplicate footer is embedded once, but both chunks are stored
+    assert sorted(embedded) == sorted([_BOILERPLATE, "Body text of the first page."])
+    assert failed == []
+    vectors = np.concatenate([batch[0] for batch in batches])
+    texts = [text for batch in batches for text in batch[1]]
+    metadatas = [metadata for batch in batches for metadata in batch[2]]
+    assert sorted(texts) == sorted(chunk["text"] for chunk in chunks)
+    footer_vectors = [vector for vector, text in zip(vectors, texts) if text.lower() == _BOILERPLATE.lower()]
+    assert len(footer_vectors) == 2
+    np.testing.assert_array_equal(footer_vectors[0], footer_vectors[1])
+    assert {metadata["user_id"] for metadata in metadatas} == {"user-1"}
+
+
+async def test_generate_embeddings_reports_duplicates_of_failed_chunk(monkeypatch):
+    monkeypatch.setattr(processor.settings, "openai_embed_batch_size", 8)
+    monkeypatch.setattr(processor.settings, "openai_embed_dim", 2)
+    engine = PDFProcessor.__new__(PDFProcessor)
+
+    async def generate_batch_embeddings(texts):
+        return [None if text == _BOILERPLATE else [1.0, 0.0] for text in texts]
+
+    engine._generate_batch_embeddings = generate_batch_embeddings
+    chunks = [
+        {"text": _BOILERPLATE, "metadata": {}},
+        {"text": "Body text of the first page.", "metadata": {}},
+        {"text": _BOILERPLATE.lower(), "metadata": {}},
+    ]
+    classification = {"category": "report", "category_name": "Report", "confidence": 0.9}
+    failed = []
+    texts = [
+        text
+        async for _, batch_texts, _ in engine._generate_embeddings(
+            chunks, classification, "report.pdf", None, failed
+        )
+        for text in batch_texts
+    ]
+    assert texts == ["Body text of the first page."]
+    assert sorted(failed) == [0, 2]
@@ -0,0 +1,59 @@
+import pytest
+
+from src.tools.document import document_tools
+from src.tools.document.document_tools import (
+    _search_cache_get,
+    _search_cache_put,
+    invalidate_search_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    document_tools._SEARCH_CACHE.clear()
+    yield
+    document_tools._SEARCH_CACHE.clear()
+
+
+def _key(query="vectors"):
+    # Same shape as the key built in search_documents
+    return (document_tools._CACHE_EPOCH, query, (), None, 5, "user-1")
+
+
+def test_put_then_get_returns_a_copy():
+    response = {"success": True, "results": []}
+    _search_cache_put(_key(), response)
+    hit = _search_cache_get(_key())
+    assert hit == response
+    hit["cached"] = True
+    assert "cached" not in _search_cache_get(_key())
+
+
+def test_invalidate_bumps_epoch_and_clears_entries():
+    old_key = _key()
+    _search_cache_put(old_key, {"success": True, "results": []})
+    epoch = document_tools._CACHE_EPOCH
+    invalidate_search_cache()
+    assert document_tools._CACHE_EPOCH == epoch + 1
+    assert _search_cache_get(old_key) is None
+    # A search that started before the upload stores under the old epoch,
+    # which no later lookup builds
+    _search_cache_put(old_key, {"success": True, "results": []})
+    assert _key() != old_key
+    assert _search_cache_get(_key()) is None
+
+
+def test_invalidate_also_clears_semantic_cache(monkeypatch):
+    cleared = []
+    monkeypatch.setattr(document_tools, "invalidate_semantic_cache", lambda: cleared.append(True))
+    invalidate_search_cache()
+    assert cleared == [True]
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(document_tools.time, "monotonic", lambda: now[0])
+    _search_cache_put(_key(), {"success": True})
+    now[0] += document_tools._SEARCH_CACHE_TTL_S + 1
+    assert _search_cache_get(_key()) is None
+    assert _key() not in document_tools._SEARCH_CACHE
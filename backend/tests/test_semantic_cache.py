@@ -0,0 +1,75 @@
+from src.tools.document import semantic_cache
+from src.tools.document.semantic_cache import SemanticCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(**overrides):
+    options = {"threshold": 0.97, "ttl_s": 60.0, "max_scopes": 4, "max_per_scope": 4}
+    options.update(overrides)
+    return SemanticCache(**options)
+
+
+def test_hit_at_or_above_threshold_only():
+    cache = _cache()
+    cache.put([1.0, 0.0], "scope", {"results": [{"text": "a"}]})
+    # Scale does not matter, only the direction
+    assert cache.get([10.0, 0.5], "scope") == {"results": [{"text": "a"}]}  # cosine ~0.9988
+    assert cache.get([1.0, 0.5], "scope") is None  # cosine ~0.894
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_scopes_never_share_entries():
+    cache = _cache()
+    cache.put([1.0, 0.0], ("user-1",), {"results": []})
+    assert cache.get([1.0, 0.0], ("user-2",)) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(semantic_cache.time, "monotonic", clock)
+    cache = _cache(ttl_s=60.0)
+    cache.put([1.0, 0.0], "scope", {"results": []})
+    clock.now += 60.0
+    assert cache.get([1.0, 0.0], "scope") == {"results": []}
+    clock.now += 0.1
+    assert cache.get([1.0, 0.0], "scope") is None
+    assert len(cache) == 0
+
+
+def test_clear_drops_every_scope():
+    cache = _cache()
+    cache.put([1.0, 0.0], "a", {"results": []})
+    cache.put([0.0, 1.0], "b", {"results": []})
+    assert len(cache) == 2
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get([1.0, 0.0], "a") is None
+
+
+def test_returned_results_are_copies():
+    cache = _cache()
+    response = {"results": [{"text": "a"}]}
+    cache.put([1.0, 0.0], "scope", response)
+    response["results"][0]["text"] = "changed by caller"
+    hit = cache.get([1.0, 0.0], "scope")
+    hit["results"].append({"text": "b"})
+    assert cache.get([1.0, 0.0], "scope") == {"results": [{"text": "a"}]}
+
+
+def test_evicts_least_recently_used_scope_and_oldest_entries():
+    cache = _cache(max_scopes=2, max_per_scope=2)
+    cache.put([1.0, 0.0], "a", {"results": [], "n": 1})
+    cache.put([1.0, 0.0], "b", {"results": []})
+    assert cache.get([1.0, 0.0], "a") is not None
+    cache.put([1.0, 0.0], "c", {"results": []})
+    assert cache.get([1.0, 0.0], "b") is None
+    cache.put([0.0, 1.0], "a", {"results": [], "n": 2})
+    cache.put([0.6, 0.8], "a", {"results": [], "n": 3})
+    assert cache.get([1.0, 0.0], "a") is None